@@ -1,7 +1,10 @@
 import os
 import re
 import time
+import requests
+import multiprocessing
 import pandas as pd
+from bs4 import BeautifulSoup
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.service import Service
@@ -9,30 +12,152 @@ from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support.ui import WebDriverWait
 from webdriver_manager.chrome import ChromeDriverManager
 from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
+from browser import apply_fast_profile, enable_request_blocking, RecyclingDriver, MAP_SAFE_BLOCKED_URL_PATTERNS
+from record_writer import RecordWriter
+from page_archive import PageArchive
+from sites import rebase_url
+from frontier import LinkFrontier, canonicalize_url, make_worker_id
+from telemetry import CrawlTelemetry, navigation_timing
+from feature_matcher import HIDDEN_FEATURES
 
-def setup_driver():
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+}
+
+# Where the coordinates hide in the initial HTML, most specific first
+NUM = r'(-?\d{1,2}\.\d{3,})'
+COORD_PATTERNS = [
+    re.compile(r'data-lat(?:itude)?=["\']' + NUM + r'["\'][^>]*?data-(?:lng|lon|long|longitude)=["\']' + NUM),
+    re.compile(r'["\']?lat(?:itude)?["\']?\s*[:=]\s*["\']?' + NUM + r'["\']?\s*,\s*["\']?(?:lng|lon|long|longitude)["\']?\s*[:=]\s*["\']?' + NUM),
+    re.compile(r'LatLng\(\s*' + NUM + r'\s*,\s*' + NUM),
+    re.compile(r'(?:[?&](?:q|query|ll|center|destination)=|@)' + NUM + r'(?:,|%2C)\s*' + NUM),
+    re.compile(r'(?:marker|setView|center)\(\s*\[\s*' + NUM + r'\s*,\s*' + NUM),
+]
+
+# Output columns, in order, and their types when writing Parquet
+BAHU_COLUMNS = [
+    "url", "price", "city", "neighbourhood", "bedrooms", "bathrooms", "surface_area",
+    "property_type", "latitude", "longitude", "description", "furnished",
+    "property_mortgaged", "lister_type", "facade", "building_age"
+]
+BAHU_SCHEMA = {
+    "bedrooms": "float", "bathrooms": "float", "latitude": "float", "longitude": "float",
+    "furnished": "bool", "property_mortgaged": "bool", "building_age": "float"
+}
+
+CLICK_COORDS = re.compile(r'(\d{2}\.\d{6,}),\s*(\d{2}\.\d{6,})')
+# A static result is only kept when all of these were found, otherwise the browser renders the page
+REQUIRED_FIELDS = ["price", "latitude", "longitude"]
+
+def setup_driver(headless=False, fast=False):
     chrome_options = Options()
     # Keep window visible for Map API stability
+    if headless:
+        chrome_options.add_argument("--headless=new")
+        chrome_options.add_argument("--window-size=1366,900")
+    # Fast mode: no fonts, media or trackers, but the map tiles and pins the
+    # click-through needs are still loaded
+    if fast:
+        apply_fast_profile(chrome_options, keep_maps=True)
     driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=chrome_options)
+    if fast:
+        enable_request_blocking(driver, MAP_SAFE_BLOCKED_URL_PATTERNS)
     return driver
 
 def parse_hidden_features(description_text):
-    if not description_text: return {}
-    desc = description_text.lower()
-    age = '0' if any(w in desc for w in ['جديد', 'حديث', 'new', 'modern', 'إنشاء']) else 'N/A'
-    age_match = re.search(r'(\d+)\s*(سنة|سنين|years)', desc)
-    if age_match: age = age_match.group(1)
-
-    return {
-        "furnished": 1 if any(w in desc for w in ['furnished', 'مفروش', 'أثاث']) else 0,
-        "property_mortgaged": 1 if any(w in desc for w in ['mortgage', 'رهن', 'مرهون', 'مصرف']) else 0,
-        "lister_type": 'Agent' if any(w in desc for w in ['شركة', 'مكتب', 'agency', 'office']) else 'Owner',
-        "facade": 'North' if 'شمال' in desc else 'South' if 'جنوب' in desc else 'East' if 'شرق' in desc else 'West' if 'غرب' in desc else 'N/A',
-        "building_age": age
+    # Keyword tables live in feature_matcher.FEATURE_KEYWORDS
+    return HIDDEN_FEATURES.parse(description_text)
+
+def in_libya(lat, lon):
+    return 19.5 <= lat <= 33 and 9 <= lon <= 25
+
+def extract_coords_from_html(html):
+    """
+    Recovers (latitude, longitude) from data already embedded in the page
+    (data attributes, inline script JSON, map URLs) without opening the map.
+    Returns None when nothing inside Libya's bounds is found.
+    """
+    if not html: return None
+    for pattern in COORD_PATTERNS:
+        for match in pattern.finditer(html):
+            lat, lon = match.groups()
+            if in_libya(float(lat), float(lon)):
+                return lat, lon
+    return None
+
+def parse_bahu_html(html, url):
+    """Same fields as extract_bahu_details, parsed from raw HTML with no browser."""
+    data = {
+        "url": url, "price": "N/A", "city": "N/A", "neighbourhood": "N/A",
+        "bedrooms": "N/A", "bathrooms": "N/A", "surface_area": "N/A",
+        "property_type": "N/A", "latitude": "N/A", "longitude": "N/A", "description": "N/A"
     }
+    soup = BeautifulSoup(html, 'html.parser')
+
+    price = soup.select_one("h5.price")
+    if price: data['price'] = price.get_text(strip=True)
+    description = soup.select_one(".description-content")
+    if description: data['description'] = description.get_text(" ", strip=True)
+    data.update(parse_hidden_features(data['description'] if description else ''))
+
+    loc = soup.select_one("div.d-flex.flex-column.align-items-center h6")
+    match = re.search(r'(.*)\((.*)\)', loc.get_text(" ", strip=True)) if loc else None
+    if match:
+        data['neighbourhood'], data['city'] = match.group(1).strip(), match.group(2).strip()
+
+    for attr in soup.select("div.w-50"):
+        value = attr.select_one(".value")
+        if not value: continue
+        txt, val = attr.get_text(" ", strip=True).lower(), value.get_text(strip=True)
+        if "type" in txt: data['property_type'] = val
+        elif "bed" in txt: data['bedrooms'] = val
+        elif "bath" in txt: data['bathrooms'] = val
+        elif "area" in txt: data['surface_area'] = val
 
-def extract_bahu_details(driver, url):
-    driver.get(url)
+    coords = extract_coords_from_html(html)
+    if coords:
+        data['latitude'], data['longitude'] = coords
+    return data
+
+def is_complete(details):
+    return bool(details) and all(details.get(field, "N/A") != "N/A" for field in REQUIRED_FIELDS)
+
+def extract_bahu_details_static(url, session=None, archive=None, telemetry=None, retry=None):
+    """
+    Fetches the listing with plain HTTP. Returns None if the page couldn't be fetched.
+    With a RetryManager, transient errors are retried and 404/410 urls are tombstoned.
+    """
+    timing = None
+    def fetch():
+        nonlocal timing
+        start = telemetry.begin() if telemetry else None
+        try:
+            response = (session or requests).get(rebase_url(url), headers=HEADERS, timeout=15)
+        except requests.RequestException as e:
+            if telemetry: telemetry.log("bahu", url, telemetry.measure(start, error=e))
+            raise
+        timing = telemetry.measure(start, response) if telemetry else None
+        if response.status_code != 200 and telemetry:
+            telemetry.log("bahu", url, timing)
+        return response
+
+    try:
+        response = retry.call(url, fetch) if retry else fetch()
+        if response is None or response.status_code != 200:
+            return None
+        if archive: archive.append(url, response.text)
+        parse_start = time.perf_counter()
+        data = parse_bahu_html(response.text, url)
+        if telemetry: telemetry.log("bahu", url, timing, time.perf_counter() - parse_start, data)
+        return data
+    except Exception as e:
+        print(f"   -> Error at {url}: {str(e)[:30]}")
+        return None
+
+def extract_bahu_details(driver, url, archive=None, telemetry=None):
+    driver.get(rebase_url(url))
+    timing = parse_start = page_html = None
     data = {
         "url": url, "price": "N/A", "city": "N/A", "neighbourhood": "N/A",
         "bedrooms": "N/A", "bathrooms": "N/A", "surface_area": "N/A",
@@ -41,6 +166,9 @@ def extract_bahu_details(driver, url):
     try:
         wait = WebDriverWait(driver, 15)
         wait.until(EC.presence_of_element_located((By.CLASS_NAME, "price")))
+        if telemetry:
+            timing, parse_start = navigation_timing(driver), time.perf_counter()
+        page_html = driver.page_source
         data['price'] = driver.find_element(By.CSS_SELECTOR, "h5.price").text.strip()
         data['description'] = driver.find_element(By.CLASS_NAME, "description-content").text.strip()
         data.update(parse_hidden_features(data['description']))
@@ -60,56 +188,280 @@ def extract_bahu_details(driver, url):
                 elif "area" in txt: data['surface_area'] = val
             except: continue
 
+        # Coordinates embedded in the initial page, no clicking needed
+        coords = extract_coords_from_html(page_html)
+        if coords:
+            data['latitude'], data['longitude'] = coords
+            print(f"   -> Captured: {data['latitude']}, {data['longitude']}")
+            if archive: archive.append(url, page_html)
+            if telemetry: telemetry.log("bahu_browser", url, timing, time.perf_counter() - parse_start, data)
+            return data
+
         # Map logic (The brute force source search)
         map_btn = driver.find_element(By.CLASS_NAME, "btn-map")
         driver.execute_script("arguments[0].click();", map_btn)
-        time.sleep(4)
+        # Wait for the map pins to render instead of sleeping a fixed 4 s
+        try:
+            WebDriverWait(driver, 10, poll_frequency=0.25).until(lambda d: d.find_elements(By.TAG_NAME, "area"))
+        except TimeoutException: pass
         pins = driver.find_elements(By.TAG_NAME, "area")
         for pin in pins: driver.execute_script("arguments[0].click();", pin)
-        time.sleep(2)
-        source = driver.page_source
-        coord_match = re.search(r'(\d{2}\.\d{6,}),\s*(\d{2}\.\d{6,})', source)
+        # ...and for the coordinates to show up instead of sleeping 2 s more
+        try:
+            WebDriverWait(driver, 5, poll_frequency=0.25).until(lambda d: CLICK_COORDS.search(d.page_source))
+        except TimeoutException: pass
+        page_html = driver.page_source
+        coord_match = CLICK_COORDS.search(page_html)
         if coord_match:
             data['latitude'], data['longitude'] = coord_match.groups()
             print(f"   -> Captured: {data['latitude']}, {data['longitude']}")
     except Exception as e:
         print(f"   -> Error at {url}: {str(e)[:30]}")
+        if telemetry and timing is None:
+            timing = navigation_timing(driver, status=None, error=e)
+    # Archived after the click-through, with the clicked coordinates the HTML alone doesn't give back
+    if archive and page_html is not None:
+        clicked = {k: data[k] for k in ("latitude", "longitude") if data[k] != "N/A"}
+        archive.append(url, page_html, extracted=clicked)
+    if telemetry:
+        # Parse time here includes the map click-through
+        telemetry.log("bahu_browser", url, timing, parse_start and time.perf_counter() - parse_start, data)
     return data
 
-def run_batch_scrape(input_csv, output_csv, start_idx, end_idx):
+def read_output(path, columns=None):
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path, columns=columns)
+    return pd.read_csv(path, usecols=columns)
+
+def load_scraped_urls(output_paths):
+    """Collects the urls already saved in any of the given output files."""
+    scraped_urls = set()
+    for path in output_paths:
+        if os.path.exists(path):
+            try:
+                scraped_urls.update(read_output(path, ['url'])['url'].tolist())
+            except: pass
+    return scraped_urls
+
+def run_batch_scrape(input_csv, output_csv, start_idx, end_idx, static_first=True,
+                     shard=None, progress_csvs=(), headless=False, fast=False, recycle_every=50,
+                     flush_every=25, archive_path=None, frontier_db=None):
+    """
+    With static_first, each listing is fetched with plain HTTP first and the
+    browser (started lazily) is only used when the coordinates, price or another
+    of REQUIRED_FIELDS aren't in the initial HTML.
+    shard=(worker_id, num_workers) keeps only every num_workers-th link, and links
+    saved in any of progress_csvs are skipped as well as those in output_csv.
+    fast=True uses the resource-blocking browser profile (map resources exempt); the browser is restarted
+    every recycle_every pages and per-page time/memory is printed at the end.
+    Rows are written in batches of flush_every (as Parquet if output_csv ends in .parquet).
+    With archive_path, every fetched page is also kept in a PageArchive.
+    With frontier_db, the links are added to that shared LinkFrontier and this
+    process claims leased batches of the links in its index range from it, so any
+    number of processes (or machines) can run this on the same queue.
+    Per-request telemetry goes to <output>.telemetry.log / <output>.telemetry.json.
+    """
     if not os.path.exists(input_csv): return
     
     # Load targets
     df_links = pd.read_csv(input_csv).drop_duplicates()
     target_links = df_links['property_url'].iloc[max(0, start_idx-1):end_idx].tolist()
 
+    # Opening the writer replays anything a crashed run left in its journal
+    writer = RecordWriter(output_csv, BAHU_COLUMNS, BAHU_SCHEMA, flush_every=flush_every)
+
     # Load existing progress to skip duplicates
-    scraped_urls = set()
-    if os.path.exists(output_csv):
-        try:
-            existing_df = pd.read_csv(output_csv)
-            scraped_urls = set(existing_df['url'].tolist())
-            print(f"Resuming: {len(scraped_urls)} links already found in {output_csv}")
-        except: pass
+    scraped_urls = load_scraped_urls([output_csv, *progress_csvs])
+    if scraped_urls:
+        print(f"Resuming: {len(scraped_urls)} links already scraped")
 
-    driver = setup_driver()
+    browser = RecyclingDriver(lambda: setup_driver(headless, fast), recycle_every)
+    archive = PageArchive(archive_path) if archive_path else None
+    output_base = os.path.splitext(output_csv)[0]
+    telemetry = CrawlTelemetry(output_base + ".telemetry.log", output_base + ".telemetry.json")
+    session = telemetry.session()
+
+    frontier = LinkFrontier(frontier_db) if frontier_db else None
+    worker_id = make_worker_id(shard[0] if shard else 0)
+    if frontier:
+        frontier.add(target_links)
+        frontier.mark_done(scraped_urls, keep_scraped_at=True)
+
+    def targets():
+        if not frontier:
+            yield from enumerate(target_links)
+            return
+        # Only this run's start/end range is claimed, even if the frontier holds other links
+        positions = {canonicalize_url(u): i for i, u in enumerate(target_links)}
+        while True:
+            batch = frontier.claim(worker_id, size=10, urls=positions)
+            if not batch: return
+            for url in batch:
+                frontier.heartbeat(worker_id)
+                yield positions[url], target_links[positions[url]]
     
     try:
-        for i, url in enumerate(target_links):
+        for i, url in targets():
             if url in scraped_urls:
+                if frontier: frontier.mark_done([url], worker_id=worker_id)
                 continue # Skip!
+            if shard and not frontier and i % shard[1] != shard[0]:
+                continue # Another worker's link
 
             print(f"[{start_idx + i}] Scraping: {url}")
-            details = extract_bahu_details(driver, url)
+            details = extract_bahu_details_static(url, session, archive, telemetry) if static_first else None
+            if is_complete(details):
+                print(f"   -> Captured: {details['latitude']}, {details['longitude']} (no browser)")
+            else:
+                # Fall back to the map click-through
+                browser.start_page()
+                details = extract_bahu_details(browser.driver, url, archive, telemetry)
+                browser.page_done()
             
-            # Save immediately to avoid losing data on crash
-            new_row = pd.DataFrame([details])
-            new_row.to_csv(output_csv, mode='a', index=False, header=not os.path.exists(output_csv))
+            # Journaled immediately, written to the output in batches
+            writer.write(details)
             scraped_urls.add(url)
+            if frontier: frontier.complete(worker_id, {url: details})
             
     finally:
-        driver.quit()
+        writer.close()
+        browser.quit()
+        if frontier: frontier.close()
+        telemetry.close()
+    browser.report("Fast browser" if fast else "Browser")
+    telemetry.report()
     print("Process complete.")
 
+def worker_output_path(output_csv, worker_id):
+    base, ext = os.path.splitext(output_csv)
+    return f"{base}.worker{worker_id}{ext}"
+
+def merge_worker_outputs(output_csv, num_workers):
+    """Appends every worker's rows to output_csv (deduplicated by url) and removes the worker files."""
+    paths = [worker_output_path(output_csv, w) for w in range(num_workers)]
+    frames = [read_output(p) for p in [output_csv, *paths] if os.path.exists(p)]
+    if not frames: return
+    merged = pd.concat(frames, ignore_index=True).drop_duplicates(subset=['url'], keep='first')
+    if output_csv.endswith('.parquet'):
+        merged.to_parquet(output_csv, index=False)
+    else:
+        merged.to_csv(output_csv, index=False)
+    for p in paths:
+        if os.path.exists(p): os.remove(p)
+    print(f"Merged {len(merged)} rows into {output_csv}")
+
+def run_parallel_scrape(input_csv, output_csv, start_idx, end_idx, num_workers=4,
+                        max_restarts=3, headless=False, static_first=True, fast=False, archive_path=None):
+    """
+    Runs num_workers browser processes, each on a disjoint shard of the links and
+    writing to its own file. A worker that dies is restarted (up to max_restarts
+    times) and resumes from what all workers have saved so far; the worker files
+    are merged into output_csv at the end. Each worker keeps its own page archive
+    (archive_path with a .workerN suffix) so no two processes append to one file.
+    """
+    if not os.path.exists(input_csv): return
+    worker_paths = [worker_output_path(output_csv, w) for w in range(num_workers)]
+
+    def start_worker(worker_id):
+        process = multiprocessing.Process(
+            target=run_batch_scrape,
+            args=(input_csv, worker_paths[worker_id], start_idx, end_idx),
+            kwargs=dict(static_first=static_first, shard=(worker_id, num_workers),
+                        progress_csvs=[output_csv, *worker_paths], headless=headless, fast=fast,
+                        archive_path=worker_output_path(archive_path, worker_id) if archive_path else None),
+            name=f"bahu-worker-{worker_id}",
+        )
+        process.start()
+        return process
+
+    workers = {w: start_worker(w) for w in range(num_workers)}
+    restarts = {w: 0 for w in range(num_workers)}
+
+    try:
+        while workers:
+            time.sleep(1)
+            for worker_id, process in list(workers.items()):
+                if process.is_alive(): continue
+                del workers[worker_id]
+                if process.exitcode != 0:
+                    if restarts[worker_id] < max_restarts:
+                        restarts[worker_id] += 1
+                        print(f"Worker {worker_id} died (exit code {process.exitcode}). Restart {restarts[worker_id]}/{max_restarts}...")
+                        workers[worker_id] = start_worker(worker_id)
+                    else:
+                        print(f"Worker {worker_id} failed {max_restarts} restarts. Giving up on its shard.")
+    except KeyboardInterrupt:
+        print("\nStopping workers. Progress saved.")
+        for process in workers.values():
+            process.terminate()
+            process.join()
+    finally:
+        merge_worker_outputs(output_csv, num_workers)
+
+def save_bahu_fixtures(urls, fixture_dir):
+    """Saves the raw HTML of each listing in fixture_server's layout (<fixture_dir>/bahu/<slug>.html)."""
+    bahu_dir = os.path.join(fixture_dir, "bahu")
+    os.makedirs(bahu_dir, exist_ok=True)
+    session = requests.Session()
+    for url in urls:
+        response = session.get(rebase_url(url), headers=HEADERS, timeout=15)
+        if response.status_code == 200:
+            name = url.rstrip('/').split('/')[-1] + ".html"
+            with open(os.path.join(bahu_dir, name), "w", encoding="utf-8") as f:
+                f.write(response.text)
+
+def benchmark_coord_extraction(fixture_dir, headless=True, links=2120):
+    """
+    Serves the saved pages with fixture_server and times both real paths on the
+    same pages: extract_bahu_details_static (plain HTTP) and the browser path of
+    extract_bahu_details (embedded coordinates, else the map click-through with
+    its event waits). Pages whose map needs Bahu's live backend spend the full
+    click-through waits, as a listing without embedded coordinates would.
+    """
+    import sites
+    from fixture_server import start_server
+
+    bahu_dir = os.path.join(fixture_dir, "bahu")
+    slugs = sorted(name[:-5] for name in os.listdir(bahu_dir) if name.endswith(".html")) if os.path.isdir(bahu_dir) else []
+    if not slugs:
+        print(f"No fixtures found in {bahu_dir}")
+        return
+    urls = [f"{sites.BAHU_SITE}/en/offers-details/fixture/{slug}" for slug in slugs]
+
+    server = start_server(fixture_dir, port=0)
+    base_url = sites.BAHU_BASE_URL
+    sites.BAHU_BASE_URL = f"http://127.0.0.1:{server.server_address[1]}/bahu"
+    driver = None
+    try:
+        # 1. Static path
+        session = requests.Session()
+        start = time.perf_counter()
+        static = [extract_bahu_details_static(url, session=session) for url in urls]
+        static_seconds = (time.perf_counter() - start) / len(urls)
+
+        # 2. Browser path as run_batch_scrape uses it, the driver started before the clock
+        driver = setup_driver(headless=headless, fast=True)
+        start = time.perf_counter()
+        browser = [extract_bahu_details(driver, url) for url in urls]
+        browser_seconds = (time.perf_counter() - start) / len(urls)
+    finally:
+        if driver is not None:
+            driver.quit()
+        sites.BAHU_BASE_URL = base_url
+        server.shutdown()
+
+    def with_coords(records):
+        return sum(r is not None and r.get('latitude', 'N/A') != 'N/A' for r in records)
+
+    static_hits = with_coords(static)
+    print(f"Pages: {len(urls)}")
+    print(f"Static:  {static_seconds * 1000:.1f} ms/page, coordinates on {static_hits} ({static_hits / len(urls):.0%})")
+    print(f"Browser: {browser_seconds * 1000:.1f} ms/page, coordinates on {with_coords(browser)}")
+    # Static first: pages with coordinates never reach the browser, the others pay for both
+    static_first = static_seconds + (1 - static_hits / len(urls)) * browser_seconds
+    print(f"Estimated on {links:,} links: browser only {links * browser_seconds / 60:.0f} min, "
+          f"static first {links * static_first / 60:.0f} min")
+
 if __name__ == "__main__":
-    run_batch_scrape("bahu_links.csv", "bahu_initial_data.csv", 1, 2120)
\ No newline at end of file
+    run_batch_scrape("bahu_links.csv", "bahu_initial_data.csv", 1, 2120)
+    # run_parallel_scrape("bahu_links.csv", "bahu_initial_data.csv", 1, 2120, num_workers=4)
\ No newline at end of file
@@ -0,0 +1,140 @@
+import time
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Requests Chrome never needs to make for scraping: images, fonts, media,
+# map tiles and trackers. Patterns use the CDP Network.setBlockedURLs syntax.
+BLOCKED_URL_PATTERNS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico", "*.bmp",
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    "*.mp4", "*.webm", "*.mp3", "*.ogg", "*.m3u8",
+    "*tile.openstreetmap.org*", "*tiles.mapbox.com*", "*api.mapbox.com/styles*",
+    "*googleapis.com/maps/vt*", "*google.com/maps/vt*", "*gstatic.com/mapfiles/*", "*khms*.google*",
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+    "*connect.facebook.net*", "*hotjar.com*",
+]
+
+# What a Google Maps widget needs to draw its tiles and marker pins (<area> click
+# targets included). Kept out of the block list when the scraper clicks on the map.
+MAP_URL_PATTERNS = [
+    "*.png", "*.svg",
+    "*googleapis.com/maps/vt*", "*google.com/maps/vt*", "*gstatic.com/mapfiles/*", "*khms*.google*",
+]
+MAP_SAFE_BLOCKED_URL_PATTERNS = [p for p in BLOCKED_URL_PATTERNS if p not in MAP_URL_PATTERNS]
+
+FAST_ARGUMENTS = [
+    "--blink-settings=imagesEnabled=false",
+    "--disable-extensions",
+    "--disable-gpu",
+    "--disable-notifications",
+    "--disable-background-networking",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--disable-translate",
+    "--mute-audio",
+    "--no-first-run",
+]
+
+FAST_PREFS = {
+    "profile.managed_default_content_settings.images": 2,
+    "profile.managed_default_content_settings.media_stream": 2,
+    "profile.default_content_setting_values.notifications": 2,
+    "profile.default_content_setting_values.geolocation": 2,
+}
+
+
+def apply_fast_profile(chrome_options, keep_maps=False):
+    """
+    Turns off the Chrome features a scraper doesn't need. With keep_maps, images
+    stay on so map markers render and can be clicked. Returns the same Options object.
+    """
+    for argument in FAST_ARGUMENTS:
+        if keep_maps and argument.startswith("--blink-settings=imagesEnabled"):
+            continue
+        chrome_options.add_argument(argument)
+    prefs = dict(FAST_PREFS)
+    if keep_maps:
+        del prefs["profile.managed_default_content_settings.images"]
+    chrome_options.add_experimental_option("prefs", prefs)
+    # Hand control back once the DOM is ready instead of waiting for every subresource
+    chrome_options.page_load_strategy = "eager"
+    return chrome_options
+
+
+def enable_request_blocking(driver, patterns=BLOCKED_URL_PATTERNS):
+    """Intercepts and drops heavy requests at the network layer (Chrome DevTools Protocol)."""
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": list(patterns)})
+    return driver
+
+
+def browser_memory_mb(driver):
+    """Resident memory of chromedriver plus all Chrome processes it started (needs psutil)."""
+    if psutil is None:
+        return None
+    try:
+        root = psutil.Process(driver.service.process.pid)
+        processes = [root, *root.children(recursive=True)]
+        return sum(p.memory_info().rss for p in processes if p.is_running()) / (1024 * 1024)
+    except Exception:
+        return None
+
+
+class RecyclingDriver:
+    """
+    Wraps a driver factory and restarts the browser every `recycle_every` pages,
+    which keeps Chrome's memory from growing over long crawls. Also records the
+    time and browser memory of every page for the end-of-run report.
+    """
+
+    def __init__(self, factory, recycle_every=50):
+        self.factory = factory
+        self.recycle_every = recycle_every
+        self._driver = None
+        self.pages_on_driver = 0
+        self.page_times = []
+        self.page_memory = []
+        self._page_start = None
+
+    @property
+    def driver(self):
+        if self._driver is None:
+            self._driver = self.factory()
+            self.pages_on_driver = 0
+        return self._driver
+
+    def start_page(self):
+        self._page_start = time.perf_counter()
+
+    def page_done(self):
+        if self._page_start is not None:
+            self.page_times.append(time.perf_counter() - self._page_start)
+            self._page_start = None
+        memory = browser_memory_mb(self._driver) if self._driver else None
+        if memory is not None:
+            self.page_memory.append(memory)
+
+        self.pages_on_driver += 1
+        if self.recycle_every and self.pages_on_driver >= self.recycle_every:
+            print(f"   -> Recycling browser after {self.pages_on_driver} pages")
+            self.quit()
+
+    def quit(self):
+        if self._driver is not None:
+            self._driver.quit()
+            self._driver = None
+
+    def report(self, label="Browser"):
+        if not self.page_times:
+            return
+        times = sorted(self.page_times)
+        line = (f"{label}: {len(times)} pages, avg {sum(times) / len(times):.2f} s/page, "
+                f"median {times[len(times) // 2]:.2f} s, max {times[-1]:.2f} s")
+        if self.page_memory:
+            line += f", memory avg {sum(self.page_memory) / len(self.page_memory):.0f} MB / peak {max(self.page_memory):.0f} MB"
+        elif psutil is None:
+            line += " (install psutil for memory figures)"
+        print(line)
@@ -1,14 +1,54 @@
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 import re
-from urllib.parse import urlparse, parse_qs
-
-def clean_data(input_csv, output_csv):
+import time
+from collections import Counter
+from gazetteer import CITY_GAZETTEER, STREET_GAZETTEER
+from storage import read_table, write_table
+from near_duplicates import NearDuplicateIndex, drop_near_duplicates
+
+# Libya bounds: coordinates outside them are mistakes
+LAT_RANGE = (19.5, 33)
+LON_RANGE = (9, 25)
+
+# Coordinates in the Google Maps link variants: ?query=lat,lon, ?q=lat,lon (also on googleusercontent
+# links, optionally "loc:"), ll=/center=/destination=lat,lon and /@lat,lon,zoom; the comma may be %2C
+LOCATION_PATTERN = re.compile(
+    r'(?:[?&](?:query|q|ll|center|destination)=(?:loc:)?|/@)'
+    r'(?P<latitude>[-+]?\d{1,3}(?:\.\d+)?)'
+    r'(?:,|%2C)(?:\+|\s|%20)*'
+    r'(?P<longitude>[-+]?\d{1,3}(?:\.\d+)?)',
+    re.IGNORECASE
+)
+
+EXCLUDED_SUBCATEGORIES = ['Farms & Chalets for Sale', 'Whole Building for Sale']
+MODE_FILL_COLUMNS = ['bedrooms', 'bathrooms', 'lister_type']   # Missing values get the column's most common value
+# Read as text in chunked mode, so a chunk that happens to hold only numbers is parsed like the whole file
+CHUNK_TEXT_COLUMNS = ['price', 'surface_area', 'bedrooms', 'bathrooms', 'subcategory', 'lister_type', 'facade',
+                      'furnished?', 'property_mortgaged?']
+CLEAN_CHUNK_ROWS = 50_000
+
+try:
+    from sklearn.preprocessing import OneHotEncoder
+except ImportError:
+    OneHotEncoder = None  # encode_features falls back to pd.get_dummies
+
+def clean_frame(df, fill_values=None, near_duplicates=None):
     """
-    Cleans and standardizes the property data.
+    Cleans and standardizes the property data. Returns a new DataFrame, df is left as it is.
+    fill_values ({column: value} for MODE_FILL_COLUMNS) replaces the modes of
+    df, e.g. with the modes of the whole file when df is one chunk of it.
+    With near_duplicates (a near_duplicates.NearDuplicateIndex), listings whose
+    description nearly repeats one already in the index (reposts with small
+    edits) are dropped, while the descriptions are still there.
     """
-    df = pd.read_csv(input_csv)
+    # Reposted listings with slightly edited descriptions
+    if near_duplicates is not None and 'description' in df.columns:
+        before = len(df)
+        df = drop_near_duplicates(df, 'description', near_duplicates.threshold, near_duplicates)
+        print(f"Dropped {before - len(df)} near-duplicate listings")
 
     # Drop unnecessary columns
     columns_to_drop = [
@@ -16,20 +56,22 @@ def clean_data(input_csv, output_csv):
         'additional_amenities', 'land_area', 'property_status', 'country',
         'real_estate_type', 'floor', 'zoned_for', 'number_of_floors', 'url', 'description'
     ]
-    df.drop(columns=columns_to_drop, inplace=True, errors='ignore')
+    df = df.drop(columns=columns_to_drop, errors='ignore')
 
     # Remove specific subcategory
-    df = df[df['subcategory'] != 'Farms & Chalets for Sale']
-    df = df[df['subcategory'] != 'Whole Building for Sale']
+    df = df[~df['subcategory'].isin(EXCLUDED_SUBCATEGORIES)]
 
     df['subcategory'] = df['subcategory'].replace({'Apartments for Sale': 'Apartment', 'Villas for Sale': 'Villa', 'Homes for Sale': 'House'})
 
     # Handle missing values
-    for col in ['bedrooms', 'bathrooms', 'lister_type']:
-        df[col] = df[col].fillna(df[col].mode()[0])
+    if fill_values is None:
+        fill_values = {col: df[col].mode()[0] for col in MODE_FILL_COLUMNS}
+    for col in MODE_FILL_COLUMNS:
+        if fill_values.get(col) is not None:
+            df[col] = df[col].fillna(fill_values[col])
 
     fill_value_columns = {'facade': 'Unknown', 'property_mortgaged?': 'No'}
-    df.fillna(value=fill_value_columns, inplace=True)
+    df = df.fillna(value=fill_value_columns)
 
     # Standardize categorical columns
     bedroom_mapping = {
@@ -45,196 +87,226 @@ def clean_data(input_csv, output_csv):
     df['bathrooms'] = df['bathrooms'].replace(bathroom_mapping).astype(float)
 
     # Clean and convert surface area to numeric
-    df['surface_area'] = (
+    df['surface_area'] = pd.to_numeric(
         df['surface_area']
         .astype(str)
         .str.replace(' meter square', '', regex=False)
-        .str.replace(' sqm', '', regex=False)
-        .apply(pd.to_numeric, errors='coerce')
-    )
+        .str.replace(' sqm', '', regex=False),
+        errors='coerce'
+    ).astype(float)
 
     # Convert to boolean
     boolean_columns = {'furnished?': 'Furnished', 'property_mortgaged?': 'Yes'}
     for col, true_value in boolean_columns.items():
-        df[col] = df[col].apply(lambda x: x == true_value)
+        df[col] = df[col] == true_value
 
     # Convert to numeric, coercing errors
     df['price'] = (df['price'].str.replace('LYD', '', regex=False).str.replace(',', '', regex=False).str.strip())
-    df['price'] = df['price'].astype(str).str.extract('(\\d+)').astype(float)
-    df['price'] = pd.to_numeric(df['price'], errors='coerce')
-
+    df['price'] = df['price'].astype(str).str.extract('(\\d+)', expand=False).astype(float)
 
     # Create price per meter square column
     df['price_per_meter_square'] = df['price'] / df['surface_area']
 
     # Remove rows with non-numeric or missing prices
-    df.dropna(subset=['price'], inplace=True)
-
-    df.to_csv(output_csv, index=False)
+    return df.dropna(subset=['price'])
 
-def transform_cleaned_data(input_csv, output_csv):
+def column_modes(input_csv, chunksize=CLEAN_CHUNK_ROWS):
+    """
+    First pass of clean_data_chunked: the mode of each MODE_FILL_COLUMNS column
+    over the rows clean_frame keeps, from running value counts, one chunk in
+    memory at a time. Ties go to the smallest value, like mode()[0].
+    """
+    counts = {col: Counter() for col in MODE_FILL_COLUMNS}
+    columns = ['subcategory'] + MODE_FILL_COLUMNS
+    for chunk in pd.read_csv(input_csv, usecols=columns, dtype=str, chunksize=chunksize):
+        chunk = chunk[~chunk['subcategory'].isin(EXCLUDED_SUBCATEGORIES)]
+        for col in MODE_FILL_COLUMNS:
+            counts[col].update(chunk[col].value_counts().to_dict())
+    modes = {}
+    for col, counter in counts.items():
+        top = max(counter.values(), default=0)
+        modes[col] = min(value for value, n in counter.items() if n == top) if counter else None
+    return modes
+
+def clean_data_chunked(input_csv, output_csv, chunksize=CLEAN_CHUNK_ROWS, near_duplicate_threshold=None):
+    """
+    clean_data for files too big for memory: one pass for the modes, then each
+    chunk is cleaned with them and appended to output_csv. Memory stays around
+    one chunk whatever the file size, and the output is the same as clean_data's.
+    One near-duplicate index is shared by all chunks, so reposts are found across
+    them (the modes are still those of every row, reposts included).
+    """
+    # 1. Global statistics
+    fill_values = column_modes(input_csv, chunksize)
+    print(f"Fill values: {fill_values}")
+
+    # 2. Clean and append chunk by chunk
+    rows_in = rows_out = 0
+    near_duplicates = NearDuplicateIndex(near_duplicate_threshold) if near_duplicate_threshold else None
+    dtypes = {col: str for col in CHUNK_TEXT_COLUMNS}
+    with open(output_csv, 'w', encoding='utf-8', newline='') as f:
+        for i, chunk in enumerate(pd.read_csv(input_csv, dtype=dtypes, chunksize=chunksize)):
+            cleaned = clean_frame(chunk, fill_values, near_duplicates)
+            cleaned.to_csv(f, index=False, header=(i == 0))
+            rows_in += len(chunk)
+            rows_out += len(cleaned)
+    print(f"Cleaned {rows_in} rows into {rows_out}, written to {output_csv}")
+
+def transform_frame(df):
     """
     Removes unrealistic property listings based on price and surface area.
     """
-    df = pd.read_csv(input_csv)
-
-    # Filter data based on realistic values
-    df = df[(df['price'] >= 15000) & (df['price'] <= 15000000)]
-    df = df[(df['surface_area'] >= 50) & (df['surface_area'] <= 1000)]
-
     # # Extract latitude and longitude from location links
     # df = extract_lat_long_from_location(df, 'location')
     # # Drop unnecessary columns
-    # df.drop(columns=['location'], errors='ignore', inplace=True)
+    # df = df.drop(columns=['location'], errors='ignore')
 
-    # Remove impossible location values (Libya bounds)
-    df = df[(df['latitude'] >= 19.5) & (df['latitude'] <= 33)]
-    df = df[(df['longitude'] >= 9) & (df['longitude'] <= 25)]
+    # Realistic values, and no impossible locations (Libya bounds)
+    return df[
+        (df['price'] >= 15000) & (df['price'] <= 15000000)
+        & (df['surface_area'] >= 50) & (df['surface_area'] <= 1000)
+        & df['latitude'].between(*LAT_RANGE) & df['longitude'].between(*LON_RANGE)
+    ]
 
-    df.to_csv(output_csv, index=False)
+def outlier_mask(df, category_columns, value_column, simultaneous=False, k=1.5):
+    """
+    Boolean array of the rows of df whose value_column lies within k IQRs of
+    the quartiles of its group, for each column of category_columns in turn.
+
+    The quartiles of all groups come from one groupby().transform per column,
+    with no Python code per group. Sequential (the default) is what running
+    the filters one after the other does: each column's quartiles are taken
+    over the rows the previous columns kept. Simultaneous takes every column's
+    quartiles over all rows, so the order of the columns doesn't matter.
+    Rows with a missing category or value are dropped, like groupby().apply did.
+    """
+    if isinstance(category_columns, str):
+        category_columns = [category_columns]
+    values = df[value_column].to_numpy(dtype=float, na_value=np.nan)
+    keep = np.ones(len(df), dtype=bool)
+    for col in category_columns:
+        rows = np.arange(len(df)) if simultaneous else np.flatnonzero(keep)
+        grouped = pd.Series(values[rows]).groupby(df[col].iloc[rows].to_numpy(), observed=True)
+        q1 = grouped.transform('quantile', 0.25).to_numpy()
+        q3 = grouped.transform('quantile', 0.75).to_numpy()
+        iqr = q3 - q1
+        inside = (values[rows] >= q1 - k * iqr) & (values[rows] <= q3 + k * iqr)
+        keep[rows[~inside]] = False
+    return keep
+
+def remove_outliers_frame(df, category_columns, value_column, simultaneous=False):
+    """Removes outliers in the value_column within each category of the category_columns (one or several)."""
+    return df[outlier_mask(df, category_columns, value_column, simultaneous)]
+
+def benchmark_outlier_filter(input_csv, scales=(1, 10, 100), value_column='price_per_meter_square',
+                             category_columns=('city', 'facade', 'subcategory', 'neighbourhood')):
+    """Times the groupby().apply passes this replaced against outlier_mask, on jittered copies of input_csv."""
+    from storage import synthetic_table
+
+    def apply_passes(df):
+        for col in category_columns:
+            def remove_outliers(group):
+                q1 = group[value_column].quantile(0.25)
+                q3 = group[value_column].quantile(0.75)
+                iqr = q3 - q1
+                return group[(group[value_column] >= q1 - 1.5 * iqr) & (group[value_column] <= q3 + 1.5 * iqr)]
+            df = df.groupby(col, group_keys=False)[df.columns.tolist()].apply(remove_outliers)
+        return df
+
+    base = read_table(input_csv)
+    for scale in scales:
+        df = synthetic_table(base, scale)
+        print(f"{scale}x: {len(df)} rows, grouped by {', '.join(category_columns)}")
+        for label, run in [("groupby().apply passes", apply_passes),
+                           ("outlier_mask, sequential", lambda d: remove_outliers_frame(d, list(category_columns), value_column)),
+                           ("outlier_mask, simultaneous", lambda d: remove_outliers_frame(d, list(category_columns), value_column, True))]:
+            start = time.perf_counter()
+            kept = run(df)
+            print(f"  {label:<28} {time.perf_counter() - start:8.3f} s, {len(kept)} rows kept")
+
+def encode_frame(df):
+    """
+    The model-ready encoding from Model/Cleaning_and_Preprocessing.ipynb: log
+    transforms, city grouping and one-hot encoding of the text columns.
+    """
+    df = df.drop(columns=['neighbourhood'])
 
-def standardize_city_name(name):
-    if not isinstance(name, str) or name.lower() == 'nan':
-        return "Other"
-    
-    #Basic Normalization
-    name = name.lower().strip()
-    name = name.replace('-', ' ').replace("'", "")
-
-    # 2. PHONETIC NORMALIZATION (The "Sounds-Like" Step)
-    # This step handles the e/i/ee and h/ah differences before the mapping
-    def normalize_sounds(text):
-        # Convert ee, i, y to a single 'i'
-        text = re.sub(r'ee|y|e', 'i', text)
-        # Handle terminal 'h' or 'ah' (Common in Arabic names like Humaidah)
-        text = re.sub(r'(ah|h)$', 'a', text)
-        # Standardize Al/An/As/Ar prefixes
-        text = re.sub(r'^(an|as|ar|at|ad|az|ash)\s+', 'al ', text)
-        # Remove double consonants (e.g., Hammoudat -> Hamodat)
-        text = re.sub(r'(.)\1+', r'\1', text)
-        return text.strip()
-
-    # 3. Comprehensive Mapping based on your latest list
-    # The keys here are the "Standard" names you want for your project
-    mapping = {
-        'tripoli': ['ain zara', 'janzour', 'Qasr Bin Ghashir', 'soug al juma’aa', 'tajoura', 'souq al jomoa', 'souq al jumaa', 'tripoli', 'طرابلس'],
-        'al khoms': ['al khoms', 'al khums'],
-        'misratah': ['misrata', 'misratah', 'misurata'],
-        'al zawiya': ['الزاويه جودايم'],
-        'other': ['l.l']
-    }
+    # Log transform the skewed columns
+    for col in ['price', 'surface_area', 'price_per_meter_square']:
+        df[col] = np.log(df[col] + 1)
+
+    # 1. Define the specific mappings
+    specific_mapping = {'Al Zawiya': 'Zawiya'}
+
+    # 2. Define the list of cities that should become 'Other'
+    other_cities = [
+        'Bani Walid', 'Tarhuna', 'Gharyan', 'Qasr Bin Ghashir',
+        'Sabratha', 'Al Wahat', 'Jumayl', 'Sorman', 'Sirte',
+        'Asbia', 'Jafara', 'Marj', 'Ajdabiya', 'Murqub', 'Al Khoms'
+    ]
+
+    # 3. Apply the specific mapping first, then group the rare cities, then title case
+    df['city'] = df['city'].replace(specific_mapping).replace(other_cities, 'Other').str.title()
+
+    # One-hot encode the text columns
+    text_columns = df.select_dtypes(include=['object', 'category']).columns.tolist()
+    if OneHotEncoder is not None:
+        encoder = OneHotEncoder(handle_unknown='ignore', sparse_output=False)
+        encoded = pd.DataFrame(encoder.fit_transform(df[text_columns]),
+                               columns=encoder.get_feature_names_out(text_columns), index=df.index)
+    else:
+        # Same columns as the encoder: sorted categories, plus <column>_nan where values are missing
+        encoded = pd.concat([pd.get_dummies(df[col], prefix=col, dummy_na=df[col].isna().any(), dtype=float)
+                             for col in text_columns], axis=1)
+    df_encoded = df.select_dtypes(exclude=['object', 'category']).join(encoded)
 
-    # First, try an exact match with the normalized version
-    normalized_name = normalize_sounds(name)
-    
-    for standard, variations in mapping.items():
-        # Normalize all variations for comparison
-        norm_variations = [normalize_sounds(v) for v in variations]
-        
-        # Check if the input (normalized) matches any variation (normalized)
-        if normalized_name in norm_variations:
-            return standard
-            
-        # Partial match (if 'ainzara' is found within 'ainzara road')
-        for nv in norm_variations:
-            if nv in normalized_name or normalized_name in nv:
-                return standard
-
-    return name.strip().title()
+    return df_encoded.drop(columns=['price_per_meter_square'])
+
+def run_all(df, outlier_columns=('city', 'facade', 'subcategory'), value_column='price_per_meter_square', encode=True):
+    """
+    Every cleaning stage on df in memory, in the order the files pipeline runs
+    them: clean, transform, the outlier passes, then the encoding. Returns the
+    final DataFrame (with a fresh index, like reading the last file back).
+    """
+    df = transform_frame(clean_frame(df))
+    df = remove_outliers_frame(df, list(outlier_columns), value_column)
+    if encode:
+        df = encode_frame(df)
+    return df.reset_index(drop=True)
+
+def clean_data(input_csv, output_csv, chunksize=None, near_duplicate_threshold=None):
+    """
+    With chunksize (rows), a CSV input is cleaned in chunks, see clean_data_chunked.
+    With near_duplicate_threshold (e.g. 0.9), reposted listings are dropped, see clean_frame.
+    """
+    if chunksize and input_csv.endswith('.csv') and output_csv.endswith('.csv'):
+        clean_data_chunked(input_csv, output_csv, chunksize, near_duplicate_threshold)
+        return
+    near_duplicates = NearDuplicateIndex(near_duplicate_threshold) if near_duplicate_threshold else None
+    write_table(clean_frame(read_table(input_csv), near_duplicates=near_duplicates), output_csv)
+
+def transform_cleaned_data(input_csv, output_csv):
+    write_table(transform_frame(read_table(input_csv)), output_csv)
+
+def remove_outliers_by_category(input_csv, output_csv, category_column, value_column, simultaneous=False):
+    """category_column can be a list, e.g. ['city', 'facade', 'subcategory'], filtered in one pass."""
+    write_table(remove_outliers_frame(read_table(input_csv), category_column, value_column, simultaneous), output_csv)
+    print(f"Outliers removed and data saved to {output_csv}")
+
+def encode_features(input_csv, output_csv):
+    write_table(encode_frame(read_table(input_csv)), output_csv)
+
+def standardize_city_name(name):
+    # The mapping and the phonetic normalization live in gazetteer.py
+    return CITY_GAZETTEER.standardize(name)
 
 def standardize_street_name(name):
-    if not isinstance(name, str) or name.lower() == 'nan':
-        return "Other"
-    
-    #Basic Normalization
-    name = name.lower().strip()
-    name = name.replace('-', ' ').replace("'", "")
-    
-    # Map Arabic to English equivalents (Add more as you find them)
-    arabic_map = {
-        'عين زارة': 'ain zara',
-        'جوددائم': 'juddaim'
-    }
-    if name in arabic_map:
-        name = arabic_map[name]
-
-    # 2. PHONETIC NORMALIZATION (The "Sounds-Like" Step)
-    # This step handles the e/i/ee and h/ah differences before the mapping
-    def normalize_sounds(text):
-        # Convert ee, i, y to a single 'i'
-        text = re.sub(r'ee|y|e', 'i', text)
-        # Handle terminal 'h' or 'ah' (Common in Arabic names like Humaidah)
-        text = re.sub(r'(ah|h)$', 'a', text)
-        # Standardize Al/An/As/Ar prefixes
-        text = re.sub(r'^(an|as|ar|at|ad|az|ash)\s+', 'al ', text)
-        # Remove double consonants (e.g., Hammoudat -> Hamodat)
-        text = re.sub(r'(.)\1+', r'\1', text)
-        return text.strip()
-
-    # 3. Comprehensive Mapping based on your latest list
-    # The keys here are the "Standard" names you want for your project
-    mapping = {
-        '20 Ramadan': ['9th of july', '20 ramadan'],
-        'Ain Zara': ['ain zara', 'ainzara'],
-        'Al Baiesh': ['al baish', 'al baish', 'albaishi', 'al baish'],
-        'Al Dahra': ['al dahra', 'al dhahra', 'zawiyat al dahmani'],
-        'Al Fatih': ['al fatih', 'al fateh'],
-        'Al Fakat': ['al faqaat', 'al fakat'],
-        'Al Furnaj': ['al furnaj', 'al fornaj'],
-        'Al Fuwayhat': ['al fuwaihat', 'al fuwaihatf', 'al fuwayhat'],
-        'Al Hadba': ['al hadba al khadra', 'alhadba alkhadra', 'alhadba', 'eastern hadba', 'hadba project'],
-        'Al Hamodat': ['al hamodat', 'al hamoudat', 'al hammoudat'],
-        'Al Kreemia': ['al kreemia', 'al krimiah', 'kriimia', 'karimia', 'alkrimiah'],
-        'Al Majouri': ['al majouri', 'al majouri', 'al majouri'],
-        'Al Nofleen': ['al nofliyen', 'al nofleen'],
-        'Al Sarraj': ['al sarraj', 'al serraj', 'hay al siraj'],
-        'Al Siyahiya': ['al siyahiya', 'al seyaheyya'],
-        'Al Swani': ['al swani', 'alswani'],
-        'Al Zawiya': ['al zawiya', 'al zawya', 'al zawiyah', 'western zawiya'],
-        'Airport Road': ['airport', 'al matar'],
-        'Bin Ashour': ['bin ashur', 'bin ashour'],
-        'Dollar': ['dollar'],
-        'Qasr Bin Ghashir': ['qasr bin ghashir', 'qasr bin ghasher', 'bab bin ghashier'],
-        'Salah Al Din': ['salah al din', 'salah al dien', 'salah aldeen'],
-        'Sidi Hussein': ['sidi husain', 'sidi hussein'],
-        'Souq Al Juma': ['souq al juma', 'souq al jumaa', 'soq al jomua'],
-        'Tajoura': ['tajura', 'tajoura'],
-        'Venice': ['venice', 'venecia'],
-        'Wildlife Road': ['wildlife', 'wild life'],
-        'Zanata': ['zanata', 'zanatah'],
-        'Al Humaida': ['al humaida', 'al humaidah', 'al humaidia'],
-        'Al Najila': ['al najila', 'al nejela', 'an najila'],
-        'Al Ruwaisat': ['alruwesat', 'al ruwaisat', 'ruweisat'],
-        'Al Salmani': ['al salmani', 'as sulmani', 'as sulmani al sharqi'],
-        'Beloun': ['baloun', 'beloun'],
-        'Diplomatic Quarter': ['diplomacy', 'diplomatic'],
-        'Espiaa': ['asbia', 'espiaa'],
-        'Hai Al Andalous': ['hai alandalus', 'hay al andalous'],
-        'Janzour': ['zanzour', 'janzour', 'zanzour al shat'],
-        'Khallet Al Furjan': ['khallet alforjan', 'khallet al furjan'],
-        'Sidi Younis': ['bin yunus', 'sidi younis'],
-        'Um Mabrokah': ['om mabroka', 'um mabrokah']
-    }
+    return STREET_GAZETTEER.standardize(name)
 
-    # First, try an exact match with the normalized version
-    normalized_name = normalize_sounds(name)
-    
-    for standard, variations in mapping.items():
-        # Normalize all variations for comparison
-        norm_variations = [normalize_sounds(v) for v in variations]
-        
-        # Check if the input (normalized) matches any variation (normalized)
-        if normalized_name in norm_variations:
-            return standard
-            
-        # Partial match (if 'ainzara' is found within 'ainzara road')
-        for nv in norm_variations:
-            if nv in normalized_name or normalized_name in nv:
-                return standard
-
-    # 4. Final Fallback: Cleanup formatting for unique names
-    name = re.sub(r'\b(road|st|street|rd|district|neighbourhood|ave|avenue|quarter)\b', '', name)
-    return name.strip().title()
+def standardize_column(df, column, gazetteer=STREET_GAZETTEER):
+    """Standardizes a whole column at once: each distinct value is only resolved once."""
+    df[column] = gazetteer.standardize_series(df[column])
+    return df
 
 def eda(input_csv):
     df = pd.read_csv(input_csv)
@@ -287,7 +359,7 @@ def basic_plotting(input_csv):
 
 def outlier_detection(input_csv, category_column, value_column, save_extention):
     """Graphs a box and whiskers plot for value_column grouped by category_column."""
-    df = pd.read_csv(input_csv)
+    df = read_table(input_csv, [category_column, value_column])
     plt.figure(figsize=(12, 8))
     sns.boxplot(x=category_column, y=value_column, data=df)
     plt.title('Price Distribution by: ' + category_column)
@@ -297,51 +369,19 @@ def outlier_detection(input_csv, category_column, value_column, save_extention):
     plt.savefig(f"graphs/box_plot_{value_column}_by_{category_column + save_extention}.png")
     plt.close()
 
-def remove_outliers_by_category(input_csv, output_csv, category_column, value_column):
-    """Removes outliers in the value_column within each category of the category_column."""
-    df = pd.read_csv(input_csv)
-
-    def remove_outliers(group):
-        q1 = group[value_column].quantile(0.25)
-        q3 = group[value_column].quantile(0.75)
-        iqr = q3 - q1
-        lower_bound = q1 - 1.5 * iqr
-        upper_bound = q3 + 1.5 * iqr
-        return group[(group[value_column] >= lower_bound) & (group[value_column] <= upper_bound)]
-
-    filtered_df = df.groupby(category_column, group_keys=False).apply(remove_outliers)
-    filtered_df.to_csv(output_csv, index=False)
-    print(f"Outliers removed and data saved to {output_csv}")
+def parse_coordinates(links):
+    """
+    Latitude and longitude (floats) from a Series of map links, NaN where a
+    link has no coordinates or they fall outside Libya.
+    """
+    coords = links.astype('string').str.extract(LOCATION_PATTERN).astype(float)
+    inside = coords['latitude'].between(*LAT_RANGE) & coords['longitude'].between(*LON_RANGE)
+    return coords.where(inside)
 
 def extract_lat_long_from_location(df, location_column):
-    latitudes = []
-    longitudes = []
-
-    for link in df[location_column]:
-        try:
-            # Parse the URL and extract the query parameters
-            parsed_url = urlparse(link)
-            query_params = parse_qs(parsed_url.query)
-
-            # Extract the 'query' parameter containing the coordinates
-            if 'query' in query_params:
-                coords = query_params['query'][0].split(',')
-                if len(coords) == 2:
-                    latitudes.append(float(coords[0]))
-                    longitudes.append(float(coords[1]))
-                else:
-                    latitudes.append(None)
-                    longitudes.append(None)
-            else:
-                latitudes.append(None)
-                longitudes.append(None)
-        except Exception as e:
-            latitudes.append(None)
-            longitudes.append(None)
-
-    df['latitude'] = latitudes
-    df['longitude'] = longitudes
-    return df
+    """Adds latitude and longitude columns parsed from the links in location_column."""
+    coords = parse_coordinates(df[location_column])
+    return df.assign(latitude=coords['latitude'], longitude=coords['longitude'])
 
 def plot_null_values_bar_chart(csv_file):
     """
@@ -389,12 +429,16 @@ def show_regression_plot(input_csv, x_column, y_column):
 
 
 if __name__ == "__main__":
+    # To run every cleaning stage, skipping the ones whose inputs and code haven't changed: python pipeline.py
     # clean_data('data/combined_data.csv','data/cleaned_data.csv')
 
     # transform_cleaned_data('data/cleaned_data.csv','data/cleaned_data_transformed.csv')
     # remove_outliers_by_category('data/cleaned_data_transformed.csv', 'data/cleaned_data_transformed.csv', 'city', 'price_per_meter_square')
     # remove_outliers_by_category('data/cleaned_data_transformed.csv', 'data/cleaned_data_transformed.csv', 'facade', 'price_per_meter_square')
     # remove_outliers_by_category('data/cleaned_data_transformed.csv', 'data/cleaned_data_transformed.csv', 'subcategory', 'price_per_meter_square')
+    # Or all three in one pass:
+    # remove_outliers_by_category('data/cleaned_data_transformed.csv', 'data/cleaned_data_transformed.csv', ['city', 'facade', 'subcategory'], 'price_per_meter_square')
+    # benchmark_outlier_filter('data/cleaned_data_transformed.csv')
 
     # outlier_detection('data/cleaned_data_transformed.csv', 'city', 'price_per_meter_square', '_post_cleaning')
     # outlier_detection('data/cleaned_data_transformed.csv', 'facade', 'price_per_meter_square', '_post_cleaning')
@@ -0,0 +1,244 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+CELL_DEGREES = 0.005        # Spatial blocking grid, ~500 m at Libyan latitudes
+AREA_BAND_RATIO = 1.1       # Area and price bands are 10% wide (log scale)
+MAX_DISTANCE_M = 250        # Listings further apart than this aren't the same property
+PRICE_TOLERANCE = 0.05      # Relative price difference still counted as the same listing
+AREA_TOLERANCE = 0.05
+COMMON_COORD_LIMIT = 20     # Coordinates shared by more listings than this are a city default, not a location
+WEIGHTS = {"price": 0.4, "area": 0.3, "geo": 0.3}
+
+# Libya bounds, same as cleaning.transform_cleaned_data
+LAT_RANGE = (19.5, 33)
+LON_RANGE = (9, 25)
+
+
+def source_of(df, url_column="url"):
+    """combined_data.csv has no source column: Bahu rows keep their url, OpenSooq rows don't."""
+    return np.where(df[url_column].astype(str).str.contains("bahu.ly", regex=False), "bahu", "opensooq")
+
+
+def to_number(series):
+    """'610,000 LYD', '210 sqm', '7 +', 3.0 ... -> float (NaN when there is no number)."""
+    text = series.astype(str).str.replace(",", "", regex=False)
+    return pd.to_numeric(text.str.extract(r"(\d+(?:\.\d+)?)", expand=False), errors="coerce")
+
+
+def place_key(series):
+    """Loose neighbourhood key: 'Al-Sarraj', 'al sarraj ' and 'Sarraj' all give 'sarraj'."""
+    text = series.astype(str).str.lower().str.replace(r"[^a-z\u0600-\u06ff]+", " ", regex=True).str.strip()
+    return text.str.replace(r"^(?:al|el|hay|hai)\s+", "", regex=True).str.replace(" ", "", regex=False)
+
+
+def matching_frame(df, common_coord_limit=COMMON_COORD_LIMIT):
+    """The numeric columns the blocking and scoring work on, one row per row of df."""
+    frame = pd.DataFrame({
+        "source": source_of(df),
+        "city": df["city"].astype(str).str.strip().str.lower(),
+        "place": place_key(df["neighbourhood"]),
+        "price": to_number(df["price"]),
+        "area": to_number(df["surface_area"]),
+        # 'Studio' has no number and counts as one bedroom, like cleaning.clean_data does
+        "bedrooms": to_number(df["bedrooms"]).where(df["bedrooms"].astype(str) != "Studio", 1.0),
+        "lat": df["latitude"].astype(float),
+        "lon": df["longitude"].astype(float),
+    })
+    frame.index = np.arange(len(frame))
+
+    valid = frame["lat"].between(*LAT_RANGE) & frame["lon"].between(*LON_RANGE)
+    # Placeholder/city-centre coordinates say nothing about where the property is
+    counts = frame.groupby(["lat", "lon"])["lat"].transform("size")
+    frame.loc[~valid | (counts > common_coord_limit), ["lat", "lon"]] = np.nan
+
+    frame["band"] = np.floor(np.log(frame["area"].where(frame["area"] > 0)) / np.log(AREA_BAND_RATIO))
+    frame["price_band"] = np.floor(np.log(frame["price"].where(frame["price"] > 0)) / np.log(AREA_BAND_RATIO))
+    frame["cell_x"] = np.floor(frame["lon"] / CELL_DEGREES)
+    frame["cell_y"] = np.floor(frame["lat"] / CELL_DEGREES)
+    return frame
+
+
+def candidate_pairs(frame, cross_source_only=True):
+    """
+    Candidate pairs (a, b) with a < b. Two blocking schemes, each done as one
+    hash join per neighbour offset so the work grows linearly with the rows:
+    - rows with coordinates: same bedrooms, neighbouring grid cell and area band
+    - rows without: same city, neighbourhood, bedrooms and neighbouring area and
+      price bands, against all rows
+    """
+    keyed = frame.dropna(subset=["bedrooms", "band"]).reset_index(names="row")
+    spatial = keyed.dropna(subset=["cell_x"])
+    pairs = []
+
+    home = spatial[["row", "source", "bedrooms", "band", "cell_x", "cell_y"]]
+    # Half of the 3x3x3 neighbourhood (plus the cell itself) finds every pair once
+    offsets = [(dx, dy, db) for dx in (-1, 0, 1) for dy in (-1, 0, 1) for db in (-1, 0, 1) if (dx, dy, db) >= (0, 0, 0)]
+    for dx, dy, db in offsets:
+        probe = home.assign(cell_x=home["cell_x"] + dx, cell_y=home["cell_y"] + dy, band=home["band"] + db)
+        joined = probe.merge(home, on=["bedrooms", "band", "cell_x", "cell_y"], suffixes=("_a", "_b"))
+        if (dx, dy, db) == (0, 0, 0):
+            joined = joined[joined["row_a"] < joined["row_b"]]
+        pairs.append(joined)
+
+    keys = ["city", "place", "bedrooms", "band", "price_band"]
+    home = keyed.dropna(subset=["price_band"])[["row", "source", *keys]]
+    probe_rows = home[home["row"].isin(keyed.loc[keyed["cell_x"].isna(), "row"])]
+    for db in (-1, 0, 1):
+        for dp in (-1, 0, 1):
+            probe = probe_rows.assign(band=probe_rows["band"] + db, price_band=probe_rows["price_band"] + dp)
+            joined = probe.merge(home, on=keys, suffixes=("_a", "_b"))
+            pairs.append(joined[joined["row_a"] != joined["row_b"]])
+
+    pairs = pd.concat([p[["row_a", "row_b", "source_a", "source_b"]] for p in pairs], ignore_index=True)
+    if cross_source_only:
+        pairs = pairs[pairs["source_a"] != pairs["source_b"]]
+    a = np.minimum(pairs["row_a"], pairs["row_b"])
+    b = np.maximum(pairs["row_a"], pairs["row_b"])
+    return pd.DataFrame({"a": a, "b": b}).drop_duplicates(ignore_index=True)
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    h = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371000 * np.arcsin(np.sqrt(h))
+
+
+def score_pairs(frame, pairs):
+    """
+    Adds price/area/geo similarities (1 = identical, NaN = unknown), a weighted
+    score over the known ones and is_duplicate: the price matches, and the area
+    and location match wherever both listings have them (at least one must).
+    """
+    a = frame.loc[pairs["a"]].reset_index(drop=True)
+    b = frame.loc[pairs["b"]].reset_index(drop=True)
+    scored = pairs.reset_index(drop=True).copy()
+
+    def relative(x, y):
+        return 1 - (x - y).abs() / np.maximum(x, y)
+
+    scored["price_sim"] = relative(a["price"], b["price"])
+    scored["area_sim"] = relative(a["area"], b["area"])
+    scored["distance_m"] = haversine_m(a["lat"], a["lon"], b["lat"], b["lon"])
+    scored["geo_sim"] = (1 - scored["distance_m"] / MAX_DISTANCE_M).clip(lower=0)
+
+    sims = scored[["price_sim", "area_sim", "geo_sim"]].to_numpy()
+    weights = np.array([WEIGHTS["price"], WEIGHTS["area"], WEIGHTS["geo"]])
+    known = ~np.isnan(sims)
+    scored["score"] = np.nansum(sims * weights, axis=1) / np.maximum((known * weights).sum(axis=1), 1e-9)
+
+    area_ok = scored["area_sim"].isna() | (scored["area_sim"] >= 1 - AREA_TOLERANCE)
+    geo_ok = scored["distance_m"].isna() | (scored["distance_m"] <= MAX_DISTANCE_M)
+    scored["is_duplicate"] = (
+        (scored["price_sim"] >= 1 - PRICE_TOLERANCE) & area_ok & geo_ok
+        & (scored["area_sim"].notna() | scored["distance_m"].notna())
+    )
+    return scored
+
+
+def cluster(n_rows, a, b):
+    """Connected components (union-find) of the duplicate pairs. Returns a cluster id per row."""
+    parent = np.arange(n_rows)
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for x, y in zip(a, b):
+        rx, ry = find(x), find(y)
+        if rx != ry:
+            parent[max(rx, ry)] = min(rx, ry)
+    return np.array([find(x) for x in range(n_rows)])
+
+
+def find_duplicates(df, cross_source_only=True):
+    """
+    Returns (df with cluster_id and is_canonical columns, scored candidate pairs).
+    Rows of one cluster are the same property; the canonical one is the most complete.
+    """
+    frame = matching_frame(df)
+    pairs = score_pairs(frame, candidate_pairs(frame, cross_source_only))
+    duplicates = pairs[pairs["is_duplicate"]]
+
+    out = df.reset_index(drop=True).copy()
+    out["cluster_id"] = cluster(len(out), duplicates["a"].to_numpy(), duplicates["b"].to_numpy())
+    completeness = out.notna().sum(axis=1)
+    canonical = completeness.groupby(out["cluster_id"]).idxmax()
+    out["is_canonical"] = False
+    out.loc[canonical.to_numpy(), "is_canonical"] = True
+    return out, pairs
+
+
+def deduplicate(df, cross_source_only=True):
+    """
+    One row per property: the canonical row of each cluster, with its missing
+    values filled from the other listings of the same property.
+    """
+    marked, _ = find_duplicates(df, cross_source_only)
+    # Bahu's placeholder coordinates mustn't win over the other listing's real ones
+    shared = marked["cluster_id"].duplicated(keep=False)
+    outside = ~(marked["latitude"].between(*LAT_RANGE) & marked["longitude"].between(*LON_RANGE))
+    marked.loc[shared & outside, ["latitude", "longitude"]] = np.nan
+    ordered = marked.sort_values("is_canonical", ascending=False, kind="stable")
+    merged = ordered.groupby("cluster_id", sort=False).first()
+    return merged.reset_index(drop=True)[list(df.columns)]
+
+
+def synthetic_listings(base, copies, seed=0):
+    """
+    `copies` copies of base for benchmarking, each moved to its own stretch of map
+    (and its own city names) so listing density stays realistic as the row count
+    grows, with prices and areas jittered by up to 3%.
+    """
+    rng = np.random.default_rng(seed)
+    parts = []
+    for k in range(copies):
+        part = base.copy()
+        part["city"] = part["city"].astype(str) + f" {k}"
+        part["latitude"] = part["latitude"] - (k % 25) * 0.4
+        part["longitude"] = part["longitude"] + (k // 25 % 10) * 0.3
+        numbers = matching_frame(base)
+        part["price"] = numbers["price"].to_numpy() * rng.uniform(0.97, 1.03, len(part))
+        part["surface_area"] = numbers["area"].to_numpy() * rng.uniform(0.97, 1.03, len(part))
+        parts.append(part)
+    return pd.concat(parts, ignore_index=True)
+
+
+def benchmark(input_csv, copies=(1, 10, 100, 250)):
+    base = pd.read_csv(input_csv)
+    for k in copies:
+        rows = synthetic_listings(base, k)
+        n = len(rows)
+        start = time.perf_counter()
+        frame = matching_frame(rows)
+        pairs = score_pairs(frame, candidate_pairs(frame))
+        elapsed = time.perf_counter() - start
+        print(f"{n:>9} rows: {len(pairs):>9} candidate pairs, {int(pairs['is_duplicate'].sum()):>7} duplicates "
+              f"in {elapsed:.2f} s ({elapsed / n * 1e6:.1f} us/row)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cross-source duplicate detection for combined listings")
+    parser.add_argument("input_csv", help="e.g. ../Data/combined_data.csv")
+    parser.add_argument("output_csv", nargs="?", help="Where to write the deduplicated listings")
+    parser.add_argument("--pairs", help="Also write the scored candidate pairs here")
+    parser.add_argument("--benchmark", action="store_true", help="Time the engine on up to ~1M synthetic rows")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.input_csv)
+    else:
+        df = pd.read_csv(args.input_csv)
+        marked, pairs = find_duplicates(df)
+        clusters = marked.groupby("cluster_id").size()
+        print(f"{len(df)} listings, {len(pairs)} candidate pairs, {int(pairs['is_duplicate'].sum())} duplicate pairs, "
+              f"{int((clusters > 1).sum())} properties listed more than once -> {len(clusters)} unique")
+        if args.pairs:
+            pairs.to_csv(args.pairs, index=False)
+        if args.output_csv:
+            deduplicate(df).to_csv(args.output_csv, index=False)
+            print(f"Deduplicated listings written to {args.output_csv}")
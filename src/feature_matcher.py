@@ -0,0 +1,200 @@
+import argparse
+import re
+import time
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None  # Optional: large keyword tables fall back to per-tag checks without it
+
+# Keywords (lowercase, matched anywhere in the text) for every tag the matcher can report.
+# Add Arabic/English variants here; the matcher is rebuilt from this table.
+FEATURE_KEYWORDS = {
+    "new": ['جديد', 'حديث', 'new', 'modern', 'إنشاء'],
+    "furnished": ['furnished', 'مفروش', 'أثاث'],
+    "mortgaged": ['mortgage', 'رهن', 'مرهون', 'مصرف'],
+    "agent": ['شركة', 'مكتب', 'agency', 'office'],
+    "North": ['شمال'],
+    "South": ['جنوب'],
+    "East": ['شرق'],
+    "West": ['غرب'],
+}
+FACADE_ORDER = ["North", "South", "East", "West"]   # First one mentioned in this order wins
+AGE_UNITS = ['سنة', 'سنين', 'years']   # building_age is the number right before one of these
+# From about this many keywords one automaton pass beats per-keyword `in` checks (see benchmark())
+AUTOMATON_MIN_KEYWORDS = 50
+
+FEATURES = ["furnished", "property_mortgaged", "lister_type", "facade", "building_age"]   # Keys of parse()
+
+# Column names of the hidden features in Data/combined_data.csv
+COMBINED_COLUMNS = {
+    "furnished": "furnished?", "property_mortgaged": "property_mortgaged?",
+    "lister_type": "lister_type", "facade": "facade", "building_age": "building_age",
+}
+
+
+class FeatureMatcher:
+    """
+    Finds which tags of FEATURE_KEYWORDS a text mentions, plus the first
+    "<n> years" age, with the keyword table compiled once.
+
+    With pyahocorasick installed and at least AUTOMATON_MIN_KEYWORDS keywords, all
+    keywords go into one Aho-Corasick automaton and the text is scanned once however
+    many keywords there are. Below that, `in` checks per tag (stopping at the first
+    hit) are faster than any Python-level single pass, so those are used instead;
+    they are also the fallback when pyahocorasick isn't installed. Either way the result is the same as testing every keyword with `in`.
+    """
+
+    def __init__(self, keywords=FEATURE_KEYWORDS, age_units=AGE_UNITS, use_automaton=None):
+        self.words = [(tag, tuple(w.lower() for w in ws)) for tag, ws in keywords.items()]
+        self.age_units = tuple(age_units)
+        self.age_pattern = re.compile(r'(?P<age>\d+)\s*(?:' + '|'.join(map(re.escape, age_units)) + ')')
+        count = sum(len(ws) for _, ws in self.words)
+        if use_automaton is None:
+            use_automaton = count >= AUTOMATON_MIN_KEYWORDS
+
+        self.automaton = None
+        if use_automaton and ahocorasick is not None:
+            tags_of = {}
+            for tag, words in self.words:
+                for word in words:
+                    tags_of.setdefault(word, set()).add(tag)
+            self.automaton = ahocorasick.Automaton()
+            for word, tags in tags_of.items():
+                self.automaton.add_word(word, frozenset(tags))
+            self.automaton.make_automaton()
+
+    def scan(self, text):
+        """Returns (set of tags found, first age as a string or None)."""
+        text = text.lower()
+        if self.automaton is not None:
+            tags = set()
+            for _, found in self.automaton.iter(text):
+                tags |= found
+        else:
+            tags = {tag for tag, words in self.words if any(w in text for w in words)}
+        # The regex walks every digit in the text, so only run it when a unit is there at all
+        match = any(unit in text for unit in self.age_units) and self.age_pattern.search(text)
+        return tags, match.group("age") if match else None
+
+    def parse(self, text):
+        """Same output as bahu_scraper.parse_hidden_features."""
+        if not text: return {}
+        tags, age = self.scan(text)
+        return {
+            "furnished": 1 if "furnished" in tags else 0,
+            "property_mortgaged": 1 if "mortgaged" in tags else 0,
+            "lister_type": 'Agent' if "agent" in tags else 'Owner',
+            "facade": next((side for side in FACADE_ORDER if side in tags), 'N/A'),
+            "building_age": age if age is not None else '0' if "new" in tags else 'N/A',
+        }
+
+    def parse_series(self, descriptions):
+        """
+        parse() over a pandas Series of descriptions, as a DataFrame with the same
+        index and the FEATURES columns. Each distinct description is only scanned
+        once. Empty/missing descriptions give NaN rows.
+        """
+        import pandas as pd
+
+        texts = descriptions.fillna("").astype(str)
+        uniques = texts.unique()
+        parsed = pd.DataFrame([self.parse(text) for text in uniques], index=uniques, columns=FEATURES)
+        return parsed.reindex(texts.to_numpy()).set_index(descriptions.index)
+
+
+HIDDEN_FEATURES = FeatureMatcher()
+
+
+def backfill_hidden_features(df, description_column="description", columns=COMBINED_COLUMNS, overwrite=False):
+    """
+    Fills the hidden-feature columns of df (e.g. Data/combined_data.csv) from its
+    descriptions. Only missing values are filled unless overwrite=True.
+    Returns a new DataFrame.
+    """
+    import pandas as pd
+
+    df = df.copy()
+    features = HIDDEN_FEATURES.parse_series(df[description_column]).replace('N/A', pd.NA)
+    features["building_age"] = pd.to_numeric(features["building_age"], errors="coerce")
+    for feature, column in columns.items():
+        if column not in df.columns:
+            df[column] = features[feature]
+        elif overwrite:
+            df[column] = features[feature].where(df[description_column].notna(), df[column])
+        else:
+            df[column] = df[column].fillna(features[feature])
+    return df
+
+
+def parse_with_scans(description_text):
+    """The keyword-by-keyword version parse_hidden_features used before, kept for the benchmark."""
+    if not description_text: return {}
+    desc = description_text.lower()
+    age = '0' if any(w in desc for w in ['جديد', 'حديث', 'new', 'modern', 'إنشاء']) else 'N/A'
+    age_match = re.search(r'(\d+)\s*(سنة|سنين|years)', desc)
+    if age_match: age = age_match.group(1)
+    return {
+        "furnished": 1 if any(w in desc for w in ['furnished', 'مفروش', 'أثاث']) else 0,
+        "property_mortgaged": 1 if any(w in desc for w in ['mortgage', 'رهن', 'مرهون', 'مصرف']) else 0,
+        "lister_type": 'Agent' if any(w in desc for w in ['شركة', 'مكتب', 'agency', 'office']) else 'Owner',
+        "facade": 'North' if 'شمال' in desc else 'South' if 'جنوب' in desc else 'East' if 'شرق' in desc else 'West' if 'غرب' in desc else 'N/A',
+        "building_age": age
+    }
+
+
+def benchmark(csv_path, description_column="description", repeat=20, extra_keywords=300):
+    """
+    Throughput of the old keyword scans vs the matcher on the descriptions
+    in csv_path, with today's keyword table and with `extra_keywords` more
+    (synthetic) keywords, and of parse_series. Also checks both give the same results.
+    """
+    import pandas as pd
+
+    texts = pd.read_csv(csv_path)[description_column].dropna().astype(str).tolist()
+    matchers = [FeatureMatcher(use_automaton=False)]
+    if ahocorasick is not None:
+        matchers.append(FeatureMatcher(use_automaton=True))
+    mismatches = sum(any(parse_with_scans(text) != m.parse(text) for m in matchers) for text in texts)
+    print(f"Results differing from the keyword scans: {mismatches} of {len(texts)}")
+    descriptions = texts * repeat
+
+    def timed(name, parse):
+        start = time.perf_counter()
+        for description in descriptions:
+            parse(description)
+        elapsed = time.perf_counter() - start
+        print(f"  {name}: {len(descriptions) / elapsed:,.0f} descriptions/s")
+
+    print(f"{len(descriptions)} descriptions:")
+    timed("old parse_hidden_features", parse_with_scans)
+    timed("FeatureMatcher.parse", HIDDEN_FEATURES.parse)
+
+    big_table = dict(FEATURE_KEYWORDS, extra=[f"kw{i}x" for i in range(extra_keywords)])
+    for label, table in [("current keywords", FEATURE_KEYWORDS), (f"+{extra_keywords} keywords", big_table)]:
+        print(f"{label} ({sum(len(ws) for ws in table.values())} keywords):")
+        timed("per-tag `in` checks", FeatureMatcher(table, use_automaton=False).scan)
+        if ahocorasick is not None:
+            timed("aho-corasick automaton", FeatureMatcher(table, use_automaton=True).scan)
+
+    series = pd.Series(descriptions)
+    start = time.perf_counter()
+    HIDDEN_FEATURES.parse_series(series)
+    elapsed = time.perf_counter() - start
+    print(f"parse_series: {len(series)} rows ({series.nunique()} distinct) in {elapsed:.2f} s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hidden-feature keyword matcher")
+    parser.add_argument("csv", help="CSV with a description column, e.g. ../Data/combined_data.csv")
+    parser.add_argument("--column", default="description")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--backfill", metavar="OUTPUT_CSV", help="Write the CSV with its feature columns backfilled")
+    args = parser.parse_args()
+
+    if args.backfill:
+        import pandas as pd
+        backfill_hidden_features(pd.read_csv(args.csv), args.column).to_csv(args.backfill, index=False)
+        print(f"Backfilled features written to {args.backfill}")
+    else:
+        benchmark(args.csv, args.column, args.repeat)
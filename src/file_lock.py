@@ -0,0 +1,53 @@
+import json
+import os
+import time
+
+LOCK_TIMEOUT = 60    # Seconds to wait for another process to finish its save
+STALE_AFTER = 300    # A lock file older than this was left behind by a process that died
+
+
+class FileLock:
+    """
+    Lock shared by every process (and machine, on a shared disk) working on one
+    file: holding it means having created <path>.lock. Used around the
+    read-merge-write saves of files that several workers update.
+    """
+
+    def __init__(self, path, timeout=LOCK_TIMEOUT, stale_after=STALE_AFTER):
+        self.lock_path = path + ".lock"
+        self.timeout = timeout
+        self.stale_after = stale_after
+
+    def __enter__(self):
+        deadline = time.time() + self.timeout
+        while True:
+            try:
+                fd = os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.write(fd, str(os.getpid()).encode())
+                os.close(fd)
+                return self
+            except FileExistsError:
+                pass
+            try:
+                if time.time() - os.path.getmtime(self.lock_path) > self.stale_after:
+                    os.remove(self.lock_path)
+                    continue
+            except FileNotFoundError:
+                continue  # Released meanwhile
+            if time.time() > deadline:
+                raise TimeoutError(f"{self.lock_path} is still held after {self.timeout}s")
+            time.sleep(0.05)
+
+    def __exit__(self, *exc):
+        try:
+            os.remove(self.lock_path)
+        except FileNotFoundError:
+            pass
+
+
+def write_json(path, data, **kwargs):
+    """Writes data to path atomically, through a temporary file of this process's own."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, **kwargs)
+    os.replace(tmp_path, path)
@@ -0,0 +1,212 @@
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+FIXTURE_DIR = "fixtures"
+
+# Layout of FIXTURE_DIR:
+#   opensooq/search_<page>.html       search result pages (page=1, 2, ...)
+#   opensooq/listings/<id>.html       detail pages for /en/search/<id>
+#   bahu/<slug>.html                  detail pages for /en/offers-details/.../<slug>
+EMPTY_SEARCH_PAGE = "<html><body><p>No results</p></body></html>"
+
+
+class FaultConfig:
+    """What the server should do wrong: added latency, 5xx errors and 429s (with Retry-After)."""
+
+    def __init__(self, latency_ms=0, jitter_ms=0, error_rate=0.0, rate_limit_rate=0.0,
+                 retry_after=2, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def roll(self):
+        with self.lock:
+            return self.random.random()
+
+    def delay_ms(self):
+        """Latency to add to one response (random.Random isn't safe to share between handler threads)."""
+        with self.lock:
+            return self.latency_ms + self.random.uniform(0, self.jitter_ms)
+
+
+def route(fixture_dir, path, query):
+    """Maps a request path to a fixture file. Returns (status, html)."""
+    site, _, rest = path.lstrip("/").partition("/")
+    rest = "/" + rest
+
+    if site == "opensooq":
+        if rest.startswith("/en/find"):
+            page = query.get("page", ["1"])[0]
+            file = os.path.join(fixture_dir, "opensooq", f"search_{page}.html")
+            # Past the last recorded page the site shows a page without cards
+            return (200, read(file)) if os.path.exists(file) else (200, EMPTY_SEARCH_PAGE)
+        match = re.search(r'/search/(\d+)', rest)
+        if match:
+            file = os.path.join(fixture_dir, "opensooq", "listings", f"{match.group(1)}.html")
+            return (200, read(file)) if os.path.exists(file) else (404, "Not found")
+
+    if site == "bahu":
+        slug = rest.rstrip("/").split("/")[-1]
+        file = os.path.join(fixture_dir, "bahu", f"{slug}.html")
+        return (200, read(file)) if os.path.exists(file) else (404, "Not found")
+
+    return 404, "Not found"
+
+
+def read(file):
+    with open(file, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def make_handler(fixture_dir, faults):
+    class FixtureHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            delay = faults.delay_ms()
+            if delay:
+                time.sleep(delay / 1000)
+
+            roll = faults.roll()
+            if roll < faults.rate_limit_rate:
+                return self.respond(429, "Too Many Requests", {"Retry-After": str(faults.retry_after)})
+            if roll < faults.rate_limit_rate + faults.error_rate:
+                return self.respond(503, "Service Unavailable")
+
+            parsed = urlparse(self.path)
+            status, html = route(fixture_dir, parsed.path, parse_qs(parsed.query))
+            etag = '"' + hashlib.sha1(html.encode("utf-8")).hexdigest() + '"'
+            if status == 200 and self.headers.get("If-None-Match") == etag:
+                return self.respond(304, "", {"ETag": etag})
+            self.respond(status, html, {"ETag": etag} if status == 200 else {})
+
+        def respond(self, status, body, headers=None):
+            data = body.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            if status != 304:
+                self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass  # Keep benchmark output readable
+
+    return FixtureHandler
+
+
+def start_server(fixture_dir=FIXTURE_DIR, port=8765, faults=None):
+    """
+    Starts the server in a background thread and returns it. Point the scrapers at it with
+    OPENSOOQ_BASE_URL=http://127.0.0.1:<port>/opensooq and BAHU_BASE_URL=http://127.0.0.1:<port>/bahu
+    (see sites.py). Call server.shutdown() when done.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(fixture_dir, faults or FaultConfig()))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def record_fixtures_from_archive(archive_path, fixture_dir=FIXTURE_DIR):
+    """Writes the latest capture of every archived search and detail page into the fixture layout."""
+    from page_archive import PageArchive
+
+    archive = PageArchive(archive_path)
+    written = 0
+    for entry in archive.entries():
+        if entry.get("status") != 200:
+            continue
+        record = archive.read(entry)
+        parsed = urlparse(record["url"])
+        if entry["site"] == "bahu":
+            file = os.path.join(fixture_dir, "bahu", parsed.path.rstrip("/").split("/")[-1] + ".html")
+        elif parsed.path.startswith("/en/find"):
+            # Search pages (main.harvest_links with an archive)
+            page = parse_qs(parsed.query).get("page", ["1"])[0]
+            file = os.path.join(fixture_dir, "opensooq", f"search_{page}.html")
+        else:
+            match = re.search(r'/search/(\d+)', parsed.path)
+            if not match:
+                continue
+            file = os.path.join(fixture_dir, "opensooq", "listings", match.group(1) + ".html")
+        os.makedirs(os.path.dirname(file), exist_ok=True)
+        with open(file, "w", encoding="utf-8") as f:
+            f.write(record["html"])
+        written += 1
+    print(f"Wrote {written} fixtures to {fixture_dir}")
+
+
+def benchmark(fixture_dir=FIXTURE_DIR, port=8765, faults=None, workers=8):
+    """Fetches and parses every OpenSooq and Bahu fixture through the server and prints throughput."""
+    from concurrent.futures import ThreadPoolExecutor
+    import requests
+    from scraper import parse_details
+    from bahu_scraper import parse_bahu_html
+
+    server = start_server(fixture_dir, port, faults)
+    base = f"http://127.0.0.1:{port}"
+    listing_dir = os.path.join(fixture_dir, "opensooq", "listings")
+    bahu_dir = os.path.join(fixture_dir, "bahu")
+    jobs = []
+    if os.path.isdir(listing_dir):
+        jobs += [(f"{base}/opensooq/en/search/{name[:-5]}", parse_details) for name in os.listdir(listing_dir)]
+    if os.path.isdir(bahu_dir):
+        jobs += [(f"{base}/bahu/en/offers-details/fixture/{name[:-5]}", parse_bahu_html) for name in os.listdir(bahu_dir)]
+
+    statuses = {}
+    def run(job):
+        url, parse = job
+        response = requests.get(url, timeout=15)
+        if response.status_code == 200:
+            parse(response.text, url)
+        return response.status_code
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for status in pool.map(run, jobs):
+            statuses[status] = statuses.get(status, 0) + 1
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+
+    print(f"{len(jobs)} pages in {elapsed:.2f} s ({len(jobs) / elapsed:.1f} pages/s, {workers} workers). "
+          f"Status codes: {json.dumps(statuses)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replays recorded OpenSooq/Bahu pages")
+    parser.add_argument("--fixtures", default=FIXTURE_DIR)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--benchmark", action="store_true", help="Run a fetch+parse benchmark and exit")
+    args = parser.parse_args()
+
+    faults = FaultConfig(args.latency_ms, args.jitter_ms, args.error_rate, args.rate_limit_rate,
+                         args.retry_after, args.seed)
+    if args.benchmark:
+        benchmark(args.fixtures, args.port, faults)
+    else:
+        server = start_server(args.fixtures, args.port, faults)
+        print(f"Serving {args.fixtures} on http://127.0.0.1:{args.port} (Ctrl+C to stop)")
+        print(f"  OPENSOOQ_BASE_URL=http://127.0.0.1:{args.port}/opensooq")
+        print(f"  BAHU_BASE_URL=http://127.0.0.1:{args.port}/bahu")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            server.shutdown()
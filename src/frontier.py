@@ -0,0 +1,247 @@
+import json
+import os
+import re
+import socket
+import sqlite3
+import time
+from urllib.parse import urlparse
+
+FRONTIER_DB = "link_frontier.db"
+LEASE_SECONDS = 300   # A claimed batch goes back to the queue if its worker is silent this long
+
+# Lower number = scraped first
+PRIORITY_NEW = 0
+PRIORITY_REFRESH = 1
+
+OPENSOOQ_ID = re.compile(r'/search/(\d+)')
+
+
+def canonicalize_url(url):
+    """
+    Returns one canonical form per listing so the same property is never queued twice.
+    OpenSooq links collapse to https://ly.opensooq.com/en/search/<id> (language, slug
+    and query noise removed); other links lose their query string, fragment and trailing slash.
+    """
+    if not isinstance(url, str) or not url.strip():
+        return None
+    url = url.strip()
+    if not url.startswith('http'):
+        url = "https://ly.opensooq.com" + url if url.startswith('/') else "https://" + url
+
+    parsed = urlparse(url)
+    host = parsed.netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+
+    if host.endswith('opensooq.com'):
+        match = OPENSOOQ_ID.search(parsed.path)
+        if match:
+            return f"https://{host}/en/search/{match.group(1)}"
+
+    path = parsed.path.rstrip('/') or '/'
+    return f"https://{host}{path}"
+
+
+def make_worker_id(n=0):
+    """Unique across processes and machines sharing one frontier file."""
+    return f"{socket.gethostname()}-{os.getpid()}-{n}"
+
+
+class LinkFrontier:
+    """
+    Persistent, deduplicated queue of listing links backed by SQLite.
+    Links are canonicalized on insert, handed out by priority (new listings before
+    stale refreshes) and claimed in batches so several scrapers can share one file.
+
+    Claims are leases: a worker must heartbeat() before lease_expires or its
+    unfinished links are handed to someone else. complete() stores the scraped
+    records and marks the links done in one transaction. complete(), and the
+    mark_*/release calls given a worker_id, only touch links that worker still
+    holds, so a worker whose lease ran out can't overwrite the new owner's work.
+    """
+
+    def __init__(self, db_path=FRONTIER_DB):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS links (
+                url TEXT PRIMARY KEY,
+                priority INTEGER NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                added_at REAL NOT NULL,
+                claimed_at REAL,
+                scraped_at REAL
+            )
+        """)
+        # Lease columns were added after the first version of the table
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(links)")}
+        if "lease_owner" not in columns:
+            self.conn.execute("ALTER TABLE links ADD COLUMN lease_owner TEXT")
+            self.conn.execute("ALTER TABLE links ADD COLUMN lease_expires REAL")
+            self.conn.execute("ALTER TABLE links ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_links_queue ON links (status, priority, added_at)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_links_lease ON links (status, lease_expires)")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                url TEXT PRIMARY KEY,
+                record TEXT NOT NULL,
+                worker TEXT,
+                scraped_at REAL NOT NULL
+            )
+        """)
+
+    def add(self, urls, priority=PRIORITY_NEW):
+        """Adds links, ignoring any whose canonical form is already known. Returns the number added."""
+        now = time.time()
+        rows = {canonicalize_url(u) for u in urls}
+        rows.discard(None)
+        before = self.conn.total_changes
+        self.conn.execute("BEGIN IMMEDIATE")
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO links (url, priority, added_at) VALUES (?, ?, ?)",
+            [(url, priority, now) for url in rows]
+        )
+        self.conn.execute("COMMIT")
+        return self.conn.total_changes - before
+
+    def add_from_file(self, links_file, priority=PRIORITY_NEW):
+        """Imports a one-link-per-line file such as all_listings_links.txt."""
+        with open(links_file, "r", encoding="utf-8") as f:
+            return self.add((line for line in f if line.strip()), priority)
+
+    def claim(self, worker_id, size=20, lease_seconds=LEASE_SECONDS, urls=None):
+        """
+        Atomically leases up to `size` pending links to worker_id, highest priority
+        first. Links whose lease ran out (their worker died) go back to pending
+        first and are handed out again in that same order.
+        With urls, only those links are claimed (e.g. one index range of the input).
+        """
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        self.conn.execute(
+            "UPDATE links SET status = 'pending', lease_owner = NULL "
+            "WHERE status = 'in_progress' AND lease_expires < ?",
+            (now,)
+        )
+        if urls is None:
+            rows = self.conn.execute(
+                "SELECT url FROM links WHERE status = 'pending' ORDER BY priority, added_at LIMIT ?",
+                (size,)
+            ).fetchall()
+        else:
+            scope = json.dumps(sorted({canonicalize_url(u) for u in urls} - {None}))
+            rows = self.conn.execute(
+                "SELECT url FROM links WHERE status = 'pending' AND url IN (SELECT value FROM json_each(?)) "
+                "ORDER BY priority, added_at LIMIT ?",
+                (scope, size)
+            ).fetchall()
+        urls = [row[0] for row in rows]
+        self.conn.executemany(
+            "UPDATE links SET status = 'in_progress', claimed_at = ?, lease_owner = ?, "
+            "lease_expires = ?, attempts = attempts + 1 WHERE url = ?",
+            [(now, worker_id, now + lease_seconds, url) for url in urls]
+        )
+        self.conn.execute("COMMIT")
+        return urls
+
+    def next_batch(self, size=20, worker_id="local"):
+        return self.claim(worker_id, size)
+
+    def heartbeat(self, worker_id, lease_seconds=LEASE_SECONDS):
+        """Extends the leases of everything worker_id still holds. Returns how many."""
+        return self.conn.execute(
+            "UPDATE links SET lease_expires = ? WHERE status = 'in_progress' AND lease_owner = ?",
+            (time.time() + lease_seconds, worker_id)
+        ).rowcount
+
+    def complete(self, worker_id, records):
+        """
+        Stores {url: record} and marks those links done, all in one transaction.
+        Links worker_id no longer holds are left to their new owner. Returns the urls stored.
+        """
+        now = time.time()
+        stored = []
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            for url, record in records.items():
+                url = canonicalize_url(url)
+                held = self.conn.execute(
+                    "UPDATE links SET status = 'done', scraped_at = ?, lease_owner = NULL "
+                    "WHERE url = ? AND status = 'in_progress' AND lease_owner = ?",
+                    (now, url, worker_id)
+                ).rowcount
+                if held:
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO results (url, record, worker, scraped_at) VALUES (?, ?, ?, ?)",
+                        (url, json.dumps(record, ensure_ascii=False), worker_id, now)
+                    )
+                    stored.append(url)
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return stored
+
+    def import_results(self, records):
+        """Loads records scraped before the results table existed (e.g. property_data.json)."""
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO results (url, record, worker, scraped_at) VALUES (?, ?, 'import', ?)",
+            [(canonicalize_url(r['url']), json.dumps(r, ensure_ascii=False), now) for r in records]
+        )
+        self.conn.execute("COMMIT")
+
+    def results(self):
+        return [json.loads(row[0]) for row in self.conn.execute("SELECT record FROM results ORDER BY scraped_at")]
+
+    def _set_status(self, urls, assignments, worker_id=None, condition="", params=()):
+        """
+        UPDATE links SET <assignments> for urls. With worker_id, only the links
+        it still holds are changed. Returns how many were.
+        """
+        query = f"UPDATE links SET {assignments} WHERE url = ?{condition}"
+        if worker_id is not None:
+            query += " AND status = 'in_progress' AND lease_owner = ?"
+        rows = [(*params, canonicalize_url(url)) + ((worker_id,) if worker_id is not None else ()) for url in urls]
+        self.conn.execute("BEGIN IMMEDIATE")
+        changed = self.conn.executemany(query, rows).rowcount
+        self.conn.execute("COMMIT")
+        return changed
+
+    def mark_done(self, urls, keep_scraped_at=False, worker_id=None):
+        """keep_scraped_at leaves links that were already scraped untouched (used when importing old results)."""
+        return self._set_status(urls, "status = 'done', scraped_at = ?, lease_owner = NULL", worker_id,
+                                " AND scraped_at IS NULL" if keep_scraped_at else "", (time.time(),))
+
+    def mark_failed(self, urls, worker_id=None):
+        """Takes links that could not be scraped out of the queue."""
+        return self._set_status(urls, "status = 'failed', claimed_at = NULL, lease_owner = NULL", worker_id)
+
+    def mark_dead(self, urls, worker_id=None):
+        """Listings that no longer exist (404/410) are never handed out again."""
+        return self._set_status(urls, "status = 'dead', claimed_at = NULL, lease_owner = NULL", worker_id)
+
+    def requeue_failed(self):
+        """Gives links that failed on a previous run another chance."""
+        return self.conn.execute("UPDATE links SET status = 'pending' WHERE status = 'failed'").rowcount
+
+    def release(self, urls, worker_id=None):
+        """Puts claimed links back in the queue (e.g. after a failed scrape)."""
+        return self._set_status(urls, "status = 'pending', claimed_at = NULL, lease_owner = NULL", worker_id)
+
+    def requeue_stale(self, max_age_days=7):
+        """Re-queues links scraped more than max_age_days ago, behind any new listings."""
+        cutoff = time.time() - max_age_days * 86400
+        cursor = self.conn.execute(
+            "UPDATE links SET status = 'pending', priority = ? WHERE status = 'done' AND scraped_at < ?",
+            (PRIORITY_REFRESH, cutoff)
+        )
+        return cursor.rowcount
+
+    def stats(self):
+        return dict(self.conn.execute("SELECT status, COUNT(*) FROM links GROUP BY status").fetchall())
+
+    def close(self):
+        self.conn.close()
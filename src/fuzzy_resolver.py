@@ -0,0 +1,251 @@
+import argparse
+import csv
+import hashlib
+import json
+import os
+import re
+import time
+from collections import Counter
+
+try:
+    from rapidfuzz.distance import Levenshtein
+except ImportError:
+    Levenshtein = None  # The pure Python edit distance below is used instead
+
+THRESHOLD = 0.8                      # Minimum similarity (1 - edits / longer length) to accept a match
+REVIEW_FILE = "unresolved_names.csv"   # Written next to the data being resolved
+PAD = "\x00"                         # Pads both ends so the first and last letters get their own trigrams
+
+NOT_WORD = re.compile(r'[^\w]+')
+
+
+def default_key(name):
+    """Lowercase, no punctuation and no spaces: 'Al-Ba'ish' and 'albaish' get the same key."""
+    return NOT_WORD.sub('', str(name).lower().replace("'", ""))
+
+
+def trigrams(key):
+    padded = PAD * 2 + key + PAD * 2
+    return Counter(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def edit_distance(a, b, limit):
+    """Levenshtein distance of a and b, or limit + 1 as soon as it must be larger than limit."""
+    if Levenshtein is not None:
+        return Levenshtein.distance(a, b, score_cutoff=limit)
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class FuzzyResolver:
+    """
+    Resolves misspelled place names to canonical ones by edit distance.
+
+    Every known spelling (canonical names and their variants) is indexed by its
+    character trigrams. A lookup only reads the posting lists of the query's
+    rarest trigrams: a spelling within k edits of the query shares all but at
+    most 3k of its trigrams, so it must show up in one of the 3k + 1 rarest ones.
+    Those candidates are filtered by length and shared trigram count, and only
+    the survivors get an edit distance computed. Lookups therefore touch a small
+    part of the index however many thousands of names it holds, and never miss
+    a spelling within the threshold.
+
+    A name is resolved when its best match reaches `threshold` and no other
+    canonical name scores as well. Everything else is counted for review and
+    written to `review_file` (e.g. ../Data/unresolved_names.csv) by save_review().
+    """
+
+    def __init__(self, entries, threshold=THRESHOLD, key=default_key, review_file=None):
+        self.threshold = threshold
+        self.key = key
+        self.review_file = review_file
+
+        self.keys = []        # Key of every indexed spelling
+        self.standards = []   # Canonical name of every indexed spelling
+        self.grams = []       # Trigram counts of every indexed spelling
+        self.postings = {}    # trigram -> indexes of the spellings containing it
+        seen = set()
+        for spelling, standard in entries:
+            k = key(spelling)
+            if not k or k in seen:
+                continue  # The first canonical name given for a spelling wins
+            seen.add(k)
+            entry = len(self.keys)
+            self.keys.append(k)
+            self.standards.append(standard)
+            self.grams.append(trigrams(k))
+            for gram in self.grams[-1]:
+                self.postings.setdefault(gram, []).append(entry)
+
+        self.memo = {}
+        self.unresolved = Counter()
+        self.guesses = {}
+
+    @classmethod
+    def from_mapping(cls, mapping, **kwargs):
+        """From a {canonical: [variants]} mapping like gazetteer.STREET_MAPPING."""
+        entries = []
+        for standard, variants in mapping.items():
+            entries.append((standard, standard))
+            entries.extend((variant, standard) for variant in variants)
+        return cls(entries, **kwargs)
+
+    @classmethod
+    def from_csv(cls, path, name_column="name", standard_column="standard", **kwargs):
+        """From a CSV of spellings and their canonical names (a missing canonical name means the spelling is one)."""
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            rows = list(csv.DictReader(f))
+        return cls([(row[name_column], row.get(standard_column) or row[name_column]) for row in rows], **kwargs)
+
+    def fingerprint(self):
+        return hashlib.sha1(json.dumps([self.threshold, self.keys, self.standards]).encode("utf-8")).hexdigest()
+
+    def allowed_edits(self, length):
+        """Most edits a match may have when the longer of the two keys has this length."""
+        return int((1 - self.threshold) * length + 1e-9)
+
+    def candidates(self, key):
+        """(index, allowed edits) of the spellings that can be within the threshold of key."""
+        n = len(key)
+        # A match is at most n / threshold long, which allows this many edits at most
+        max_edits = self.allowed_edits(n / self.threshold)
+        grams = trigrams(key)
+        rarest = sorted(grams, key=lambda g: len(self.postings.get(g, ())))[:3 * max_edits + 1]
+        found = set()
+        for gram in rarest:
+            found.update(self.postings.get(gram, ()))
+
+        kept = []
+        for entry in found:
+            m = len(self.keys[entry])
+            edits = self.allowed_edits(max(n, m))
+            if abs(n - m) > edits:
+                continue
+            # q-gram lemma: within `edits` edits, at least max(n, m) + 2 - 3 * edits trigrams are shared
+            shared = sum(min(count, self.grams[entry][gram]) for gram, count in grams.items())
+            if shared >= max(n, m) + 2 - 3 * edits:
+                kept.append((entry, edits))
+        return kept
+
+    def match(self, name):
+        """(canonical name or None, best guess, similarity of the best guess)."""
+        key = self.key(name)
+        if not key:
+            return None, None, 0.0
+        best = {}   # canonical name -> best similarity
+        for entry, edits in self.candidates(key):
+            distance = edit_distance(key, self.keys[entry], edits)
+            if distance <= edits:
+                similarity = 1 - distance / max(len(key), len(self.keys[entry]))
+                standard = self.standards[entry]
+                best[standard] = max(best.get(standard, 0.0), similarity)
+        if not best:
+            return None, None, 0.0
+        ranked = sorted(best.items(), key=lambda s: -s[1])
+        guess, similarity = ranked[0]
+        ambiguous = len(ranked) > 1 and ranked[1][1] == similarity
+        if similarity >= self.threshold and not ambiguous:
+            return guess, guess, similarity
+        return None, guess, similarity
+
+    def resolve(self, name, count=1):
+        """
+        The canonical name for name, or None (and the name is kept for review,
+        counted `count` times: the number of rows it stands for).
+        """
+        if name not in self.memo:
+            self.memo[name] = self.match(name)
+        standard, guess, similarity = self.memo[name]
+        if standard is None:
+            self.unresolved[name] += count
+            self.guesses[name] = (guess, similarity)
+        return standard
+
+    def save_review(self, path=None):
+        """
+        Writes the names unresolved so far in this run (with their best guess) to
+        the review CSV, most frequent first. The file is rewritten, so running
+        again over the same data gives the same counts.
+        """
+        path = path or self.review_file
+        rows = []
+        for name, count in self.unresolved.most_common():
+            guess, similarity = self.guesses[name]
+            rows.append({"name": name, "best_guess": guess or "", "similarity": round(similarity, 3), "count": count})
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=["name", "best_guess", "similarity", "count"])
+            writer.writeheader()
+            writer.writerows(rows)
+        os.replace(tmp_path, path)
+        return path
+
+
+def benchmark(names, canonical_sizes=(100, 1_000, 10_000), seed=0):
+    """
+    Lookup time of misspelled names against canonical lists of growing size,
+    trigram index vs comparing the name with every spelling.
+    """
+    import random
+
+    rng = random.Random(seed)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+
+    def misspell(name):
+        chars = list(name)
+        i = rng.randrange(len(chars))
+        chars[i] = rng.choice(letters)
+        return "".join(chars)
+
+    for size in canonical_sizes:
+        # Real names first, then made-up ones of similar shape
+        canonical = list(names)[:size]
+        while len(canonical) < size:
+            canonical.append("al " + "".join(rng.choice(letters) for _ in range(rng.randint(4, 10))))
+        resolver = FuzzyResolver([(c, c) for c in canonical], review_file=None)
+        queries = [misspell(default_key(c)) for c in rng.sample(canonical, min(500, size))]
+
+        start = time.perf_counter()
+        resolved = sum(resolver.match(q)[0] is not None for q in queries)
+        indexed = (time.perf_counter() - start) / len(queries)
+
+        start = time.perf_counter()
+        for q in queries[:50]:
+            for k in resolver.keys:
+                edit_distance(q, k, resolver.allowed_edits(max(len(q), len(k))))
+        scan = (time.perf_counter() - start) / min(50, len(queries))
+        print(f"{size:>6} canonical names: trigram index {indexed * 1e3:.2f} ms/name "
+              f"({resolved}/{len(queries)} resolved), full scan {scan * 1e3:.2f} ms/name")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Trigram-indexed fuzzy place name resolver")
+    parser.add_argument("input_csv", help="e.g. ../Data/combined_data.csv")
+    parser.add_argument("--column", default="neighbourhood")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    parser.add_argument("--review", help=f"Where to write the unresolved names (default: {REVIEW_FILE} next to input_csv)")
+    parser.add_argument("--benchmark", action="store_true")
+    args = parser.parse_args()
+
+    import pandas as pd
+    from gazetteer import STREET_MAPPING, fuzzy_key
+
+    values = pd.read_csv(args.input_csv)[args.column].dropna().astype(str)
+    if args.benchmark:
+        benchmark(values.unique())
+    else:
+        review = args.review or os.path.join(os.path.dirname(os.path.abspath(args.input_csv)), REVIEW_FILE)
+        resolver = FuzzyResolver.from_mapping(STREET_MAPPING, threshold=args.threshold, key=fuzzy_key,
+                                              review_file=review)
+        resolved = values.map(resolver.resolve)
+        print(f"{resolved.notna().sum()} of {len(values)} names resolved, "
+              f"{len(resolver.unresolved)} distinct unresolved names written to {resolver.save_review()}")
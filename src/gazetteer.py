@@ -0,0 +1,297 @@
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import re
+import time
+
+import numpy as np
+
+from fuzzy_resolver import REVIEW_FILE, FuzzyResolver, default_key
+
+GAZETTEER_CACHE = "gazetteer_cache.json"   # Written under the directory given to use_cache_dir(), if any
+
+# The keys are the standard names, the values the spellings that map to them.
+# Order matters: a name matching several standards gets the first one.
+CITY_MAPPING = {
+    'tripoli': ['ain zara', 'janzour', 'Qasr Bin Ghashir', 'soug al juma’aa', 'tajoura', 'souq al jomoa', 'souq al jumaa', 'tripoli', 'طرابلس'],
+    'al khoms': ['al khoms', 'al khums'],
+    'misratah': ['misrata', 'misratah', 'misurata'],
+    'al zawiya': ['الزاويه جودايم'],
+    'other': ['l.l']
+}
+
+# Map Arabic to English equivalents (Add more as you find them)
+STREET_ALIASES = {
+    'عين زارة': 'ain zara',
+    'جوددائم': 'juddaim'
+}
+
+STREET_MAPPING = {
+    '20 Ramadan': ['9th of july', '20 ramadan'],
+    'Ain Zara': ['ain zara', 'ainzara'],
+    'Al Baiesh': ['al baish', 'al baish', 'albaishi', 'al baish'],
+    'Al Dahra': ['al dahra', 'al dhahra', 'zawiyat al dahmani'],
+    'Al Fatih': ['al fatih', 'al fateh'],
+    'Al Fakat': ['al faqaat', 'al fakat'],
+    'Al Furnaj': ['al furnaj', 'al fornaj'],
+    'Al Fuwayhat': ['al fuwaihat', 'al fuwaihatf', 'al fuwayhat'],
+    'Al Hadba': ['al hadba al khadra', 'alhadba alkhadra', 'alhadba', 'eastern hadba', 'hadba project'],
+    'Al Hamodat': ['al hamodat', 'al hamoudat', 'al hammoudat'],
+    'Al Kreemia': ['al kreemia', 'al krimiah', 'kriimia', 'karimia', 'alkrimiah'],
+    'Al Majouri': ['al majouri', 'al majouri', 'al majouri'],
+    'Al Nofleen': ['al nofliyen', 'al nofleen'],
+    'Al Sarraj': ['al sarraj', 'al serraj', 'hay al siraj'],
+    'Al Siyahiya': ['al siyahiya', 'al seyaheyya'],
+    'Al Swani': ['al swani', 'alswani'],
+    'Al Zawiya': ['al zawiya', 'al zawya', 'al zawiyah', 'western zawiya'],
+    'Airport Road': ['airport', 'al matar'],
+    'Bin Ashour': ['bin ashur', 'bin ashour'],
+    'Dollar': ['dollar'],
+    'Qasr Bin Ghashir': ['qasr bin ghashir', 'qasr bin ghasher', 'bab bin ghashier'],
+    'Salah Al Din': ['salah al din', 'salah al dien', 'salah aldeen'],
+    'Sidi Hussein': ['sidi husain', 'sidi hussein'],
+    'Souq Al Juma': ['souq al juma', 'souq al jumaa', 'soq al jomua'],
+    'Tajoura': ['tajura', 'tajoura'],
+    'Venice': ['venice', 'venecia'],
+    'Wildlife Road': ['wildlife', 'wild life'],
+    'Zanata': ['zanata', 'zanatah'],
+    'Al Humaida': ['al humaida', 'al humaidah', 'al humaidia'],
+    'Al Najila': ['al najila', 'al nejela', 'an najila'],
+    'Al Ruwaisat': ['alruwesat', 'al ruwaisat', 'ruweisat'],
+    'Al Salmani': ['al salmani', 'as sulmani', 'as sulmani al sharqi'],
+    'Beloun': ['baloun', 'beloun'],
+    'Diplomatic Quarter': ['diplomacy', 'diplomatic'],
+    'Espiaa': ['asbia', 'espiaa'],
+    'Hai Al Andalous': ['hai alandalus', 'hay al andalous'],
+    'Janzour': ['zanzour', 'janzour', 'zanzour al shat'],
+    'Khallet Al Furjan': ['khallet alforjan', 'khallet al furjan'],
+    'Sidi Younis': ['bin yunus', 'sidi younis'],
+    'Um Mabrokah': ['om mabroka', 'um mabrokah']
+}
+
+# PHONETIC NORMALIZATION (The "Sounds-Like" Step), compiled once.
+# Handles the e/i/ee and h/ah differences before the mapping
+SOUND_RULES = [
+    (re.compile(r'ee|y|e'), 'i'),                            # Convert ee, i, y to a single 'i'
+    (re.compile(r'(ah|h)$'), 'a'),                           # Terminal 'h' or 'ah' (Humaidah)
+    (re.compile(r'^(an|as|ar|at|ad|az|ash)\s+'), 'al '),     # Standardize Al/An/As/Ar prefixes
+    (re.compile(r'(.)\1+'), r'\1'),                          # Double consonants (Hammoudat -> Hamodat)
+]
+ROAD_WORDS = re.compile(r'\b(road|st|street|rd|district|neighbourhood|ave|avenue|quarter)\b')
+
+
+def normalize_sounds(text):
+    for pattern, replacement in SOUND_RULES:
+        text = pattern.sub(replacement, text)
+    return text.strip()
+
+
+def title_fallback(name):
+    return name.strip().title()
+
+
+def street_fallback(name):
+    # Cleanup formatting for unique names
+    return ROAD_WORDS.sub('', name).strip().title()
+
+
+def fuzzy_key(name):
+    """Key the fuzzy resolver compares: 'Al-Fateh Road' -> 'alfatia', like 'al fatih'."""
+    name = ROAD_WORDS.sub('', str(name).lower().replace('-', ' ').replace("'", ""))
+    return default_key(normalize_sounds(' '.join(name.split())))
+
+
+class Gazetteer:
+    """
+    Maps free-text place names to standard names, built once from a mapping.
+
+    A name matches a standard when its normalized form equals, contains or is
+    contained in one of the standard's normalized variations, and the first
+    standard in mapping order wins. Instead of scanning every variation, two
+    hash indexes answer this: every normalized variation -> first standard (for
+    "variation in name", looked up for each substring of the name), and every
+    substring of every variation -> first standard (for "name in variation").
+
+    Names matching nothing go to the `fuzzy` resolver if there is one (a
+    misspelling of a known variation), then to `fallback`.
+
+    Results are memoized per raw value and, with cache_file, kept across runs
+    (the cache is dropped when the mapping, the normalization code or its
+    SOUND_RULES / ROAD_WORDS patterns change). Nothing is written until
+    flush() is called.
+    """
+
+    def __init__(self, mapping, aliases=None, fallback=title_fallback, cache_file=None, fuzzy=None):
+        self.standards = list(mapping)
+        self.aliases = aliases or {}
+        self.fallback = fallback
+        self.cache_file = cache_file
+        self.fuzzy = fuzzy
+
+        self.exact = {}       # normalized variation -> index of its first standard
+        self.contains = {}    # substring of a normalized variation -> index of its first standard
+        for i, variations in enumerate(mapping.values()):
+            for variation in variations:
+                nv = normalize_sounds(variation)
+                self.exact.setdefault(nv, i)
+                for start in range(len(nv) + 1):
+                    for end in range(start, len(nv) + 1):
+                        self.contains.setdefault(nv[start:end], i)
+        self.lengths = sorted({len(nv) for nv in self.exact})
+
+        # The code and the rules it uses: editing any of them must not serve stale cached results
+        source = inspect.getsource(normalize_sounds) + inspect.getsource(fallback)
+        rules = [[pattern.pattern, replacement] for pattern, replacement in SOUND_RULES] + [ROAD_WORDS.pattern]
+        fuzzy_state = ([inspect.getsource(FuzzyResolver), inspect.getsource(fuzzy.key), fuzzy.fingerprint()]
+                       if fuzzy else None)
+        self.fingerprint = hashlib.sha1(
+            json.dumps([mapping, self.aliases, source, rules, fuzzy_state]).encode("utf-8")).hexdigest()
+        self.memo = {}
+        self.new_entries = 0
+        if cache_file:
+            self.use_cache(cache_file)
+
+    def use_cache(self, cache_file):
+        """Keeps the memo in cache_file from now on, starting with what an earlier run saved there."""
+        self.cache_file = cache_file
+        if os.path.exists(cache_file):
+            with open(cache_file, "r", encoding="utf-8") as f:
+                cached = json.load(f).get(self.fingerprint, {})
+            self.memo.update(cached)
+
+    def resolve(self, name, count=1):
+        """The standard name for one value, without the memo (`count`: how many rows have it, for the review)."""
+        return self._resolve(name, count)[0]
+
+    def _resolve(self, name, count=1):
+        """(standard name, whether the name went unresolved and was counted for review)."""
+        if not isinstance(name, str) or name.lower() == 'nan':
+            return "Other", False
+
+        # Basic Normalization
+        name = name.lower().strip()
+        name = name.replace('-', ' ').replace("'", "")
+        name = self.aliases.get(name, name)
+        normalized = normalize_sounds(name)
+
+        best = self.contains.get(normalized)   # The name is part of a variation (or equal to one)
+        for length in self.lengths:             # A variation is part of the name
+            if length > len(normalized):
+                break
+            for start in range(len(normalized) - length + 1):
+                i = self.exact.get(normalized[start:start + length])
+                if i is not None and (best is None or i < best):
+                    best = i
+        if best is not None:
+            return self.standards[best], False
+        if self.fuzzy is not None:
+            match = self.fuzzy.resolve(name, count)
+            if match is not None:
+                return match, False
+            return self.fallback(name), True
+        return self.fallback(name), False
+
+    def standardize(self, name, count=1):
+        """
+        Memoized resolve(). Names sent to the fuzzy resolver's review aren't
+        memoized, so every occurrence (in this run and later ones) is counted.
+        """
+        if not isinstance(name, str):
+            return "Other"
+        result = self.memo.get(name)
+        if result is None:
+            result, unresolved = self._resolve(name, count)
+            if not unresolved:
+                self.memo[name] = result
+                self.new_entries += 1
+        return result
+
+    def standardize_series(self, series):
+        """Standardizes a pandas Series, resolving each distinct value only once."""
+        import pandas as pd
+
+        codes, uniques = pd.factorize(series)
+        counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+        # Missing values get code -1, which picks the trailing "Other"
+        results = np.array([self.standardize(value, int(count)) for value, count in zip(uniques, counts)] + ["Other"],
+                           dtype=object)
+        out = pd.Series(results[codes], index=series.index)
+        self.flush()
+        return out
+
+    def flush(self):
+        """
+        Saves the new cache entries and the unresolved names for review. Called by
+        standardize_series; callers of standardize() call it when they are done.
+        """
+        if self.cache_file and self.new_entries:
+            self.save()
+        if self.fuzzy is not None and self.fuzzy.review_file and self.fuzzy.unresolved:
+            self.fuzzy.save_review()
+
+    def save(self):
+        caches = {}
+        if os.path.exists(self.cache_file):
+            with open(self.cache_file, "r", encoding="utf-8") as f:
+                caches = json.load(f)
+        caches[self.fingerprint] = self.memo
+        tmp_path = self.cache_file + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(caches, f, ensure_ascii=False)
+        os.replace(tmp_path, self.cache_file)
+        self.new_entries = 0
+
+
+CITY_GAZETTEER = Gazetteer(CITY_MAPPING)
+STREET_GAZETTEER = Gazetteer(STREET_MAPPING, STREET_ALIASES, street_fallback,
+                             fuzzy=FuzzyResolver.from_mapping(STREET_MAPPING, key=fuzzy_key))
+
+
+def use_cache_dir(cache_dir):
+    """Keeps the memo of CITY_GAZETTEER and STREET_GAZETTEER across runs, e.g. in ../Data/cache."""
+    os.makedirs(cache_dir, exist_ok=True)
+    for gazetteer in (CITY_GAZETTEER, STREET_GAZETTEER):
+        gazetteer.use_cache(os.path.join(cache_dir, GAZETTEER_CACHE))
+
+
+def use_review_dir(data_dir):
+    """Writes the street names STREET_GAZETTEER couldn't resolve to <data_dir>/unresolved_names.csv on flush()."""
+    STREET_GAZETTEER.fuzzy.review_file = os.path.join(data_dir, REVIEW_FILE)
+
+
+def benchmark(input_csv, column="neighbourhood", n_rows=1_000_000, seed=0):
+    """
+    Standardizes a synthetic n_rows column sampled from the distinct values of
+    input_csv[column] (plus unseen spellings): row by row with no memo, then
+    with standardize_series cold and warm.
+    """
+    import pandas as pd
+
+    values = pd.read_csv(input_csv)[column].dropna().astype(str).unique().tolist()
+    # Some never-seen spellings too, like a new scrape would bring
+    values += [f"{v} {suffix}" for v in values[:200] for suffix in ("Road", "District", "2")]
+    column_values = pd.Series(values).sample(n_rows, replace=True, random_state=seed).reset_index(drop=True)
+    print(f"{n_rows} rows, {len(values)} distinct values")
+
+    gazetteer = Gazetteer(STREET_MAPPING, STREET_ALIASES, street_fallback)
+    sample = column_values.iloc[:50_000]
+    start = time.perf_counter()
+    sample.map(gazetteer.resolve)
+    per_row = (time.perf_counter() - start) / len(sample)
+    print(f"  per row, no memo: {per_row * 1e6:.1f} us/row (~{per_row * n_rows:.1f} s for all rows)")
+
+    for label in ("cold", "warm"):
+        start = time.perf_counter()
+        gazetteer.standardize_series(column_values)
+        print(f"  standardize_series ({label} memo): {time.perf_counter() - start:.2f} s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="City/neighbourhood gazetteer")
+    parser.add_argument("input_csv", help="e.g. ../Data/combined_data.csv")
+    parser.add_argument("--column", default="neighbourhood")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+    benchmark(args.input_csv, args.column, args.rows)
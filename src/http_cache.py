@@ -0,0 +1,172 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+
+import requests
+
+from file_lock import FileLock, write_json
+
+CACHE_DIR = "http_cache"
+
+
+class HttpCache:
+    """
+    Local cache of fetched pages, stored zlib-compressed and keyed by URL.
+
+    On a revisit the stored ETag / Last-Modified are sent back as
+    If-None-Match / If-Modified-Since. A 304, or a 200 whose body hashes the same
+    as last time, counts as unchanged and the record parsed last time is returned
+    so the page isn't parsed again. Entries are evicted by age and by total size.
+    One cache can be shared by the threads of a pool: the index and stats are
+    only touched under a lock, the requests themselves run outside it.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_age_days=30, max_size_mb=500):
+        self.cache_dir = cache_dir
+        self.max_age = max_age_days * 86400
+        self.max_size = max_size_mb * 1024 * 1024
+        self.index_path = os.path.join(cache_dir, "index.json")
+        self.lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self.index = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                self.index = json.load(f)
+        self.stats = {
+            "requests": 0, "not_modified": 0, "same_hash": 0, "changed": 0, "new": 0,
+            "bytes_downloaded": 0, "bytes_saved": 0, "parse_seconds_saved": 0.0,
+        }
+
+    def _body_path(self, url):
+        return os.path.join(self.cache_dir, hashlib.sha1(url.encode("utf-8")).hexdigest() + ".z")
+
+    def read_body(self, url):
+        entry = self.index.get(url)
+        if not entry or not os.path.exists(self._body_path(url)):
+            return None
+        with open(self._body_path(url), "rb") as f:
+            return zlib.decompress(f.read()).decode("utf-8")
+
+    def fetch(self, url, headers=None, timeout=15, session=None, fetch_url=None):
+        """
+        Returns (response, text, cached_record). cached_record is the record
+        parsed last time when the page hasn't changed, else None and the caller
+        should parse `text` and hand the result to remember_parse().
+        fetch_url, if given, is requested instead of url (the cache key stays url).
+        """
+        with self.lock:
+            entry = self.index.get(url)
+            request_headers = dict(headers or {})
+            if entry:
+                if entry.get("etag"):
+                    request_headers["If-None-Match"] = entry["etag"]
+                if entry.get("last_modified"):
+                    request_headers["If-Modified-Since"] = entry["last_modified"]
+
+        response = (session or requests).get(fetch_url or url, headers=request_headers, timeout=timeout)
+        body = response.content
+
+        with self.lock:
+            self.stats["requests"] += 1
+            self.stats["bytes_downloaded"] += len(body)
+
+            if response.status_code == 304 and entry:
+                self.stats["not_modified"] += 1
+                self.stats["bytes_saved"] += entry["size"]
+                return self._unchanged(url, entry, response)
+
+            if response.status_code != 200:
+                return response, None, None
+
+            body_hash = hashlib.sha1(body).hexdigest()
+            if entry and entry["hash"] == body_hash:
+                self.stats["same_hash"] += 1
+                return self._unchanged(url, entry, response)
+
+            self.stats["changed" if entry else "new"] += 1
+            compressed = zlib.compress(body, 6)
+            with open(self._body_path(url), "wb") as f:
+                f.write(compressed)
+            self.index[url] = {
+                "hash": body_hash,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "fetched_at": time.time(),
+                "size": len(body),
+                "stored_size": len(compressed),
+                "record": None,
+                "parse_seconds": 0.0,
+            }
+        return response, response.text, None
+
+    def _unchanged(self, url, entry, response):
+        """Called with the lock held."""
+        entry["fetched_at"] = time.time()
+        entry["etag"] = response.headers.get("ETag", entry.get("etag"))
+        entry["last_modified"] = response.headers.get("Last-Modified", entry.get("last_modified"))
+        if entry.get("record") is not None:
+            self.stats["parse_seconds_saved"] += entry.get("parse_seconds", 0.0)
+            return response, None, entry["record"]
+        # Unchanged but never parsed: hand back the stored body
+        return response, self.read_body(url), None
+
+    def remember_parse(self, url, record, parse_seconds):
+        with self.lock:
+            if url in self.index:
+                self.index[url]["record"] = record
+                self.index[url]["parse_seconds"] = parse_seconds
+
+    def evict(self):
+        """Drops entries older than max_age_days, then the oldest ones until under max_size_mb."""
+        with self.lock:
+            return self._evict()
+
+    def _evict(self):
+        now = time.time()
+        removed = 0
+        for url in [u for u, e in self.index.items() if now - e["fetched_at"] > self.max_age]:
+            self._remove(url)
+            removed += 1
+
+        total = sum(e["stored_size"] for e in self.index.values())
+        for url in sorted(self.index, key=lambda u: self.index[u]["fetched_at"]):
+            if total <= self.max_size:
+                break
+            total -= self.index[url]["stored_size"]
+            self._remove(url)
+            removed += 1
+        return removed
+
+    def _remove(self, url):
+        path = self._body_path(url)
+        if os.path.exists(path):
+            os.remove(path)
+        del self.index[url]
+
+    def save(self):
+        """
+        Writes the index, merged with what other processes sharing cache_dir saved
+        meanwhile. The file lock keeps two workers from merging at the same time.
+        """
+        with self.lock, FileLock(self.index_path):
+            if os.path.exists(self.index_path):
+                with open(self.index_path, "r", encoding="utf-8") as f:
+                    for url, entry in json.load(f).items():
+                        if url not in self.index or entry["fetched_at"] > self.index[url]["fetched_at"]:
+                            self.index[url] = entry
+            # Entries whose body another process evicted are dropped
+            for url in [u for u in self.index if not os.path.exists(self._body_path(u))]:
+                del self.index[url]
+            self._evict()
+            write_json(self.index_path, self.index, ensure_ascii=False)
+
+    def report(self):
+        s = self.stats
+        unchanged = s["not_modified"] + s["same_hash"]
+        print(f"HTTP cache: {s['requests']} requests, {s['new']} new, {s['changed']} changed, "
+              f"{unchanged} unchanged ({s['not_modified']} x 304, {s['same_hash']} same hash)")
+        print(f"Downloaded {s['bytes_downloaded'] / 1024:.0f} KB, saved {s['bytes_saved'] / 1024:.0f} KB "
+              f"and {s['parse_seconds_saved']:.1f} s of parsing")
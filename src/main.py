@@ -1,35 +1,83 @@
 import time
-import random
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from bs4 import BeautifulSoup
+from browser import apply_fast_profile, enable_request_blocking, RecyclingDriver
+from sites import OPENSOOQ_SITE, OPENSOOQ_BASE_URL
+from rate_control import AdaptiveRateController
+from telemetry import CrawlTelemetry, navigation_timing
+from page_archive import PageArchive
 
-def harvest_links():
-    # 1. Setup
+LINKS_FILE = "all_listings_links.txt"
+MAX_PAGES = 10
+KNOWN_RATIO_THRESHOLD = 0.8   # Stop once 80% of a page is links we already have
+
+def load_known_links(links_file=LINKS_FILE):
+    """Returns the set of links already saved in the links file."""
+    try:
+        with open(links_file, "r", encoding="utf-8") as file:
+            return {line.strip() for line in file if line.strip()}
+    except FileNotFoundError:
+        return set()
+
+def setup_driver(fast=True):
     chrome_options = Options()
     chrome_options.add_argument("--headless") # Keep it fast
     chrome_options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
     chrome_options.add_argument("--no-sandbox")
     chrome_options.add_argument("--disable-dev-shm-usage")
-    
+    # Fast mode: no images, fonts, media or map tiles
+    if fast:
+        apply_fast_profile(chrome_options)
+
     driver = webdriver.Chrome(options=chrome_options)
+    if fast:
+        enable_request_blocking(driver)
+    return driver
+
+def harvest_links(incremental=False, known_threshold=KNOWN_RATIO_THRESHOLD, fast=True, recycle_every=50,
+                  archive_path=None):
+    """
+    Harvests listing links from the search pages (sorted by most recent).
+
+    With incremental=True, links already in LINKS_FILE are skipped, and the
+    harvest stops as soon as a page is mostly (known_threshold) made of known
+    links, since everything after it has been harvested on a previous run.
+    fast=True blocks heavy resources; the browser is restarted every recycle_every pages.
+    With archive_path, every search page is kept in a PageArchive (e.g. for fixture_server.py).
+    """
+    # 1. Setup
+    browser = RecyclingDriver(lambda: setup_driver(fast), recycle_every)
+    # One browser, so only the pause adapts (starts around the old 3-6 s)
+    controller = AdaptiveRateController(max_concurrency=1, delay=4.5, min_delay=1.5)
+    telemetry = CrawlTelemetry("harvest_telemetry.log", "harvest_telemetry.json", summary_every=5)
+    archive = PageArchive(archive_path) if archive_path else None
     
     # base_url = "https://ly.opensooq.com/en/property/residential-for-sale?page="
-    base_url = "https://ly.opensooq.com/en/find?sort_code=recent&page="
+    base_url = f"{OPENSOOQ_BASE_URL}/en/find?sort_code=recent&page="
     page_number = 1
     next_part = "&vertical_link=Property/Buy/Buy+Residential"
     total_links_saved = 0
+    known_links = load_known_links() if incremental else set()
+    pages_fetched = 0
+    bytes_fetched = 0
+    stopped_early = False
 
     print("--- Starting Link Harvest ---")
+    if incremental:
+        print(f"Incremental mode: {len(known_links)} links already known.")
 
     try:
-        while (page_number <= 10):
+        while (page_number <= MAX_PAGES):
             target_url = f"{base_url}{page_number}{next_part}"
             print(f"Scraping Page {page_number}...")
             
+            browser.start_page()
+            driver = browser.driver
+            page_start = time.perf_counter()
             driver.get(target_url)
 
             # 2. Wait for the cards to appear
@@ -37,41 +85,75 @@ def harvest_links():
                 WebDriverWait(driver, 15).until(
                     EC.presence_of_all_elements_located((By.CLASS_NAME, "postListItemData"))
                 )
-            except Exception:
+            except Exception as e:
                 # If we wait 15 seconds and no cards appear, we are either blocked or finished
                 print(f"No listings found on page {page_number}. Checking if we are finished...")
+                telemetry.log("opensooq_search", target_url, navigation_timing(driver, status=None, error=e))
                 break
+            controller.record(200, time.perf_counter() - page_start)
 
             # 3. Parse HTML
-            soup = BeautifulSoup(driver.page_source, 'html.parser')
+            timing = navigation_timing(driver)
+            page_source = driver.page_source
+            browser.page_done()
+            if archive:
+                # Archived under the real site's URL, like the detail pages
+                archive.append(f"{OPENSOOQ_SITE}/en/find?sort_code=recent&page={page_number}{next_part}", page_source)
+            pages_fetched += 1
+            bytes_fetched += len(page_source.encode("utf-8"))
+            parse_start = time.perf_counter()
+            soup = BeautifulSoup(page_source, 'html.parser')
             cards = soup.select('a.postListItemData')
+            telemetry.log("opensooq_search", target_url, timing, time.perf_counter() - parse_start)
 
             if not cards:
                 print("End of results reached.")
                 break
 
+            page_links = []
+            for card in cards:
+                href = card.get('href')
+                if href:
+                    page_links.append(OPENSOOQ_SITE + href if not href.startswith('http') else href)
+
+            new_links = [link for link in page_links if link not in known_links]
+            known_count = len(page_links) - len(new_links)
+
             # 4. Save to file IMMEDIATELY (Append mode 'a')
-            with open("all_listings_links.txt", "a", encoding="utf-8") as file:
-                for card in cards:
-                    href = card.get('href')
-                    if href:
-                        full_link = "https://ly.opensooq.com" + href if not href.startswith('http') else href
-                        file.write(full_link + "\n")
-                        total_links_saved += 1
-            
-            print(f"Saved {len(cards)} links. Total so far: {total_links_saved}")
+            with open(LINKS_FILE, "a", encoding="utf-8") as file:
+                for full_link in (new_links if incremental else page_links):
+                    file.write(full_link + "\n")
+                    known_links.add(full_link)
+                    total_links_saved += 1
+
+            print(f"Saved {len(new_links) if incremental else len(page_links)} links "
+                  f"({known_count} already known). Total so far: {total_links_saved}")
+
+            # Everything older than a mostly-known page was harvested on a previous run
+            if incremental and page_links and known_count / len(page_links) >= known_threshold:
+                print(f"Page {page_number} is {known_count}/{len(page_links)} known links. Stopping early.")
+                stopped_early = True
+                break
 
             # 5. Human-like behavior
             page_number += 1
-            time.sleep(random.uniform(3, 6)) # Vital for avoiding IP bans
+            controller.wait() # Vital for avoiding IP bans
 
     except KeyboardInterrupt:
         print("\nProcess stopped by user. Progress saved.")
     except Exception as e:
         print(f"An error occurred: {e}")
     finally:
-        driver.quit()
+        browser.quit()
+        browser.report("Fast browser" if fast else "Browser")
+        telemetry.close()
+        telemetry.report()
         print(f"--- Harvest Complete! Total links in file: {total_links_saved} ---")
+        if incremental:
+            pages_saved = MAX_PAGES - page_number if stopped_early else 0
+            avg_page_bytes = bytes_fetched / pages_fetched if pages_fetched else 0
+            print(f"Pages fetched: {pages_fetched}. Pages saved: {pages_saved} "
+                  f"(~{pages_saved * avg_page_bytes / 1024:.0f} KB not downloaded).")
 
 if __name__ == "__main__":
-    harvest_links()
+    harvest_links(incremental=True)
@@ -0,0 +1,202 @@
+import argparse
+import json
+import re
+import time
+
+import numpy as np
+
+SHINGLE_SIZE = 5       # Characters per shingle; works the same for Arabic and English text
+NUM_PERM = 128         # MinHash signature length
+THRESHOLD = 0.9        # Estimated Jaccard similarity above which two descriptions are near-duplicates
+
+MAX_HASH = np.uint64((1 << 32) - 1)
+
+ARABIC_DIACRITICS = re.compile(r'[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]')  # Tashkeel and tatweel
+ARABIC_LETTERS = str.maketrans({'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا', 'ى': 'ي', 'ة': 'ه', 'ؤ': 'و', 'ئ': 'ي'})
+ARABIC_DIGITS = str.maketrans('٠١٢٣٤٥٦٧٨٩۰۱۲۳۴۵۶۷۸۹', '01234567890123456789')
+NOT_WORD = re.compile(r'[^\w]+')
+
+
+def normalize_text(text):
+    """Lowercase, unify Arabic letter variants and digits, drop diacritics and punctuation."""
+    text = ARABIC_DIACRITICS.sub('', str(text).lower())
+    text = text.translate(ARABIC_LETTERS).translate(ARABIC_DIGITS)
+    return NOT_WORD.sub(' ', text).strip()
+
+
+def shingle_hashes(text, k=SHINGLE_SIZE):
+    """32-bit hashes of the distinct k-character shingles of the normalized text."""
+    codes = np.frombuffer(normalize_text(text).encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+    if len(codes) == 0:
+        return np.zeros(0, dtype=np.uint64)
+    k = min(k, len(codes))
+    # Polynomial rolling hash over every window, k vector operations in total
+    h = np.zeros(len(codes) - k + 1, dtype=np.uint64)
+    for j in range(k):
+        h = h * np.uint64(1_000_003) + codes[j:len(codes) - k + 1 + j]
+    return np.unique((h ^ (h >> np.uint64(32))) & MAX_HASH)
+
+
+def lsh_params(threshold, num_perm):
+    """
+    Bands x rows (= num_perm) whose S-curve, (1/bands)^(1/rows), is closest to
+    the threshold, so pairs around it have an even chance of becoming candidates.
+    """
+    options = [(b, num_perm // b) for b in range(1, num_perm + 1) if num_perm % b == 0]
+    return min(options, key=lambda br: abs((1 / br[0]) ** (1 / br[1]) - threshold))
+
+
+class NearDuplicateIndex:
+    """
+    MinHash signatures of texts in an LSH index. Each signature is cut into
+    `bands` bands; texts sharing any band bucket become candidates, and candidates
+    whose estimated Jaccard similarity reaches `threshold` are near-duplicates. A
+    lookup only touches the texts in its buckets, not the whole index, and texts
+    can be inserted one at a time as listings arrive.
+    """
+
+    def __init__(self, threshold=THRESHOLD, num_perm=NUM_PERM, shingle_size=SHINGLE_SIZE, seed=1):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.seed = seed
+        self.bands, self.rows = lsh_params(threshold, num_perm)
+        rng = np.random.default_rng(seed)
+        # Multiply-shift hashing, ((a * x + b) mod 2^64) >> 32 with odd a: no modulo needed
+        self.a = rng.integers(0, 1 << 63, num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self.b = rng.integers(0, 1 << 63, num_perm, dtype=np.uint64)
+        self.signatures = {}
+        self.buckets = [{} for _ in range(self.bands)]
+
+    def signature(self, text):
+        hashes = shingle_hashes(text, self.shingle_size)
+        if len(hashes) == 0:
+            return np.full(self.num_perm, MAX_HASH, dtype=np.uint64)
+        # One row per permutation, one column per shingle (uint64 arithmetic wraps on purpose)
+        permuted = (np.outer(self.a, hashes) + self.b[:, None]) >> np.uint64(32)
+        return permuted.min(axis=1)
+
+    def _band_keys(self, signature):
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def query(self, text=None, signature=None):
+        """[(key, estimated similarity)] of indexed texts similar to text, most similar first."""
+        if signature is None:
+            signature = self.signature(text)
+        candidates = set()
+        for band, band_key in zip(self.buckets, self._band_keys(signature)):
+            candidates.update(band.get(band_key, ()))
+        matches = []
+        for key in candidates:
+            similarity = float(np.mean(self.signatures[key] == signature))
+            if similarity >= self.threshold:
+                matches.append((key, similarity))
+        return sorted(matches, key=lambda m: -m[1])
+
+    def insert(self, key, text):
+        """Adds text under key and returns what it is a near-duplicate of (before adding it)."""
+        signature = self.signature(text)
+        matches = self.query(signature=signature)
+        self.signatures[key] = signature
+        for band, band_key in zip(self.buckets, self._band_keys(signature)):
+            band.setdefault(band_key, []).append(key)
+        return matches
+
+    def __contains__(self, key):
+        return key in self.signatures
+
+    def __len__(self):
+        return len(self.signatures)
+
+    def save(self, path):
+        state = {"threshold": self.threshold, "num_perm": self.num_perm, "shingle_size": self.shingle_size,
+                 "seed": self.seed, "signatures": {k: s.tolist() for k, s in self.signatures.items()}}
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        index = cls(state["threshold"], state["num_perm"], state["shingle_size"], state["seed"])
+        for key, signature in state["signatures"].items():
+            signature = np.array(signature, dtype=np.uint64)
+            index.signatures[key] = signature
+            for band, band_key in zip(index.buckets, index._band_keys(signature)):
+                band.setdefault(band_key, []).append(key)
+        return index
+
+
+def find_near_duplicates(df, column="description", key_column=None, threshold=THRESHOLD, index=None):
+    """
+    Runs df[column] through the index in row order. Returns a DataFrame of
+    (key, duplicate_of, similarity), one row per text that matched an earlier one.
+    Keys are df[key_column] (e.g. 'url') or the index labels.
+    """
+    import pandas as pd
+
+    index = index if index is not None else NearDuplicateIndex(threshold)
+    keys = df[key_column] if key_column else df.index.to_series()
+    found = []
+    for key, text in zip(keys.astype(str), df[column]):
+        if not isinstance(text, str) or not text.strip() or key in index:
+            continue
+        matches = index.insert(key, text)
+        if matches:
+            found.append((key, *matches[0]))
+    return pd.DataFrame(found, columns=["key", "duplicate_of", "similarity"])
+
+
+def drop_near_duplicates(df, column="description", threshold=THRESHOLD, index=None):
+    """
+    df without the rows whose description nearly repeats an earlier row's. Pass
+    the same index for every chunk of a file to also catch repeats across chunks.
+    """
+    duplicates = find_near_duplicates(df, column, threshold=threshold, index=index)
+    return df[~df.index.astype(str).isin(duplicates["key"])]
+
+
+def benchmark(input_csv, column="description", copies=20, threshold=THRESHOLD):
+    """Indexes the descriptions (plus lightly edited copies) and reports insert rate and matches."""
+    import pandas as pd
+
+    texts = pd.read_csv(input_csv)[column].dropna().astype(str).tolist()
+    rng = np.random.default_rng(0)
+    edited = []
+    for k in range(copies):
+        for text in texts:
+            words = text.split()
+            if len(words) > 10:
+                # A repost: a couple of words dropped and a phone number changed
+                drop = set(rng.choice(len(words), 2, replace=False))
+                words = [w for i, w in enumerate(words) if i not in drop] + [f"09{rng.integers(10**7, 10**8)}"]
+            edited.append(" ".join(words))
+
+    index = NearDuplicateIndex(threshold)
+    start = time.perf_counter()
+    matched = sum(bool(index.insert(str(i), text)) for i, text in enumerate(texts + edited))
+    elapsed = time.perf_counter() - start
+    total = len(texts) + len(edited)
+    print(f"{total} descriptions indexed in {elapsed:.2f} s ({total / elapsed:,.0f}/s), "
+          f"{index.bands} bands x {index.rows} rows; {matched} flagged as near-duplicates "
+          f"({len(edited)} were edited reposts)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MinHash/LSH near-duplicate descriptions")
+    parser.add_argument("input_csv")
+    parser.add_argument("--column", default="description")
+    parser.add_argument("--key", default=None, help="Column identifying each row, e.g. url")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    parser.add_argument("--output", help="Write the near-duplicate pairs to this CSV")
+    parser.add_argument("--benchmark", action="store_true")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.input_csv, args.column, threshold=args.threshold)
+    else:
+        import pandas as pd
+        pairs = find_near_duplicates(pd.read_csv(args.input_csv), args.column, args.key, args.threshold)
+        print(f"{len(pairs)} near-duplicate descriptions")
+        if args.output:
+            pairs.to_csv(args.output, index=False)
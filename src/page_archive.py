@@ -0,0 +1,179 @@
+import argparse
+import json
+import os
+import re
+import threading
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlparse
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Named after the codec new frames are written with
+ARCHIVE_FILE = "pages.warc.zst" if zstandard is not None else "pages.warc.zlib"
+
+
+def site_of(url):
+    return "bahu" if "bahu.ly" in url else "opensooq"
+
+
+def is_listing_page(url):
+    """
+    False for the OpenSooq search pages main.harvest_links archives (/en/find?...),
+    which have no listing to extract. Same split as fixture_server.record_fixtures_from_archive.
+    """
+    return site_of(url) == "bahu" or re.search(r'/search/\d+', urlparse(url).path) is not None
+
+
+def compress(data):
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=10).compress(data)
+    return "zlib", zlib.compress(data, 6)
+
+
+def decompress(codec, data):
+    if codec == "zstd":
+        if zstandard is None:
+            raise ImportError("This archive was written with zstd: pip install zstandard")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+class PageArchive:
+    """
+    Append-only archive of raw fetched pages (WARC-like). Every page is its own
+    compressed frame (zstd when installed, zlib otherwise) appended to one file,
+    and <archive>.idx gets a JSON line with the url, offset and length of the
+    frame, so any page can be read back without decompressing the others.
+    Values the page's HTML can't give back (e.g. coordinates the browser only got
+    by clicking on the map) are stored with it as `extracted`.
+    """
+
+    def __init__(self, path=ARCHIVE_FILE):
+        self.path = path
+        self.index_path = path + ".idx"
+        self.lock = threading.Lock()   # Offsets must match the index when threads append
+
+    def append(self, url, html, status=200, extracted=None):
+        record = {"url": url, "fetched_at": time.time(), "status": status, "html": html}
+        if extracted:
+            record["extracted"] = extracted
+        codec, frame = compress(json.dumps(record, ensure_ascii=False).encode("utf-8"))
+        with self.lock:
+            with open(self.path, "ab") as f:
+                offset = f.tell()
+                f.write(frame)
+            entry = {"url": url, "offset": offset, "length": len(frame), "codec": codec,
+                     "fetched_at": record["fetched_at"], "status": status, "site": site_of(url)}
+            with open(self.index_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+
+    def entries(self, latest_only=True):
+        """Index entries, keeping only the most recent capture of each url by default."""
+        if not os.path.exists(self.index_path):
+            return []
+        entries = []
+        with open(self.index_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+        if latest_only:
+            entries = list({e["url"]: e for e in entries}.values())
+        return entries
+
+    def read(self, entry):
+        with open(self.path, "rb") as f:
+            f.seek(entry["offset"])
+            return json.loads(decompress(entry["codec"], f.read(entry["length"])))
+
+
+def _extract_chunk(archive_path, entries):
+    """Runs in a worker process: parses one slice of the archive with the current extractors."""
+    from scraper import parse_details
+    from bahu_scraper import parse_bahu_html
+
+    archive = PageArchive(archive_path)
+    results = []
+    with open(archive.path, "rb") as f:
+        for entry in entries:
+            if entry.get("status") != 200:
+                continue
+            f.seek(entry["offset"])
+            record = json.loads(decompress(entry["codec"], f.read(entry["length"])))
+            try:
+                if entry["site"] == "bahu":
+                    data = parse_bahu_html(record["html"], record["url"])
+                    # The clicked map coordinates aren't in the HTML
+                    for key, value in record.get("extracted", {}).items():
+                        if data.get(key, "N/A") == "N/A":
+                            data[key] = value
+                    results.append(("bahu", data))
+                else:
+                    results.append(("opensooq", parse_details(record["html"], record["url"])))
+            except Exception as e:
+                print(f"Error re-extracting {record['url']}: {e}")
+    return results
+
+
+def merge_records(existing, records):
+    """existing with the records of the same url replaced by the new ones, and new urls appended."""
+    merged = {r["url"]: r for r in existing}
+    merged.update({r["url"]: r for r in records})
+    return list(merged.values())
+
+
+def reextract(archive_paths, opensooq_json="property_data.json", bahu_csv="bahu_initial_data.csv",
+              workers=None, chunk_size=200):
+    """
+    Re-runs scraper.parse_details / bahu_scraper.parse_bahu_html over every archived
+    listing page (search pages are skipped) in a process pool (all cores by default), with no network. The records are
+    merged into both outputs by url, so listings that were scraped before archiving
+    (or never archived) are kept as they are.
+    """
+    import pandas as pd
+
+    jobs = []
+    for archive_path in archive_paths:
+        entries = [e for e in PageArchive(archive_path).entries() if is_listing_page(e["url"])]
+        jobs += [(archive_path, entries[i:i + chunk_size]) for i in range(0, len(entries), chunk_size)]
+
+    start = time.perf_counter()
+    opensooq, bahu = [], []
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        futures = [pool.submit(_extract_chunk, path, chunk) for path, chunk in jobs]
+        for future in futures:
+            for site, record in future.result():
+                (bahu if site == "bahu" else opensooq).append(record)
+
+    if opensooq:
+        existing = []
+        if os.path.exists(opensooq_json):
+            with open(opensooq_json, "r", encoding="utf-8") as f:
+                existing = json.load(f)
+        with open(opensooq_json, "w", encoding="utf-8") as f:
+            json.dump(merge_records(existing, opensooq), f, indent=4, ensure_ascii=False)
+    if bahu:
+        existing = pd.read_csv(bahu_csv).to_dict("records") if os.path.exists(bahu_csv) else []
+        pd.DataFrame(merge_records(existing, bahu)).to_csv(bahu_csv, index=False)
+    print(f"Re-extracted {len(opensooq)} OpenSooq and {len(bahu)} Bahu pages "
+          f"in {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Raw page archive tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+    re_cmd = commands.add_parser("reextract", help="Re-run the extractors over archived pages")
+    re_cmd.add_argument("archives", nargs="+")
+    re_cmd.add_argument("--opensooq-json", default="property_data.json")
+    re_cmd.add_argument("--bahu-csv", default="bahu_initial_data.csv")
+    re_cmd.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.command == "reextract":
+        reextract(args.archives, args.opensooq_json, args.bahu_csv, args.workers)
@@ -0,0 +1,280 @@
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from graphlib import TopologicalSorter
+
+# Kept in the data directory, so runs over different --data-dir don't overwrite each other's state
+PIPELINE_STATE = "pipeline_state.json"   # Cache keys, output hashes and last timings of every stage
+PIPELINE_LOG = "pipeline_runs.log"       # One JSON line per stage per run
+
+
+class Stage:
+    """
+    One step of the pipeline: func(*inputs, *outputs, *args, **kwargs), the
+    path-to-path convention of the cleaning functions. Stages are connected by
+    their files: a stage depends on whichever stage writes one of its inputs.
+    """
+
+    def __init__(self, name, func, inputs, outputs, args=(), kwargs=None):
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.args = tuple(args)
+        self.kwargs = kwargs or {}
+
+    def code(self):
+        """Source of the function and of the functions of its module it calls, e.g. clean_data -> clean_frame."""
+        sources, todo, seen = [], [self.func], set()
+        while todo:
+            func = todo.pop()
+            if func in seen:
+                continue
+            seen.add(func)
+            sources.append(f"{func.__module__}.{func.__qualname__}\n{inspect.getsource(func)}")
+            codes = [func.__code__]
+            while codes:
+                code = codes.pop()
+                codes.extend(c for c in code.co_consts if inspect.iscode(c))  # Nested functions
+                for name in code.co_names:
+                    called = func.__globals__.get(name)
+                    if inspect.isfunction(called) and called.__module__ == self.func.__module__:
+                        todo.append(called)
+        return "\n".join(sorted(sources))
+
+
+def file_hash(path, known=None):
+    """sha256 of the file, reusing `known` {path: [mtime_ns, size, hash]} while the file is untouched."""
+    stat = os.stat(path)
+    entry = (known or {}).get(path)
+    if entry and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+        return entry[2]
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    if known is not None:
+        known[path] = [stat.st_mtime_ns, stat.st_size, digest.hexdigest()]
+    return digest.hexdigest()
+
+
+def _run_stage(func, inputs, outputs, args, kwargs):
+    start = time.perf_counter()
+    func(*inputs, *outputs, *args, **kwargs)
+    return time.perf_counter() - start
+
+
+class Pipeline:
+    """
+    Runs stages as a DAG. Each stage's cache key is the hash of its input files,
+    its source code and its parameters; a stage whose key matches the last
+    successful run, and whose outputs are still the files it wrote, is skipped.
+    Stages whose inputs are ready run at the same time in worker processes, and
+    when one fails only the stages downstream of it are left out.
+
+    The code hashed is the stage function plus the functions of its own module
+    it calls; after changing code in another module (e.g. gazetteer.py), run
+    with force=True (or that stage name in `force`).
+    """
+
+    def __init__(self, stages, state_file=PIPELINE_STATE, log_file=PIPELINE_LOG, workers=4):
+        self.stages = {stage.name: stage for stage in stages}
+        self.state_file = state_file
+        self.log_file = log_file
+        self.workers = workers
+
+        writers = {}
+        for stage in stages:
+            for path in stage.outputs:
+                if path in writers:
+                    raise ValueError(f"{path} is written by both {writers[path]} and {stage.name}")
+                writers[path] = stage.name
+        self.upstream = {stage.name: {writers[p] for p in stage.inputs if p in writers} for stage in stages}
+        # Raises graphlib.CycleError when the stages depend on each other in a loop
+        self.order = list(TopologicalSorter(self.upstream).static_order())
+
+    def load_state(self):
+        if os.path.exists(self.state_file):
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        return {"stages": {}, "files": {}}
+
+    def save_state(self, state):
+        tmp_path = self.state_file + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, self.state_file)
+
+    def cache_key(self, stage, files):
+        inputs = {path: file_hash(path, files) for path in stage.inputs}
+        parts = [stage.code(), inputs, stage.outputs, repr(stage.args), repr(sorted(stage.kwargs.items()))]
+        return hashlib.sha256(json.dumps(parts).encode("utf-8")).hexdigest()
+
+    def up_to_date(self, stage, key, state):
+        previous = state["stages"].get(stage.name)
+        if not previous or previous.get("key") != key:
+            return False
+        for path in stage.outputs:
+            if not os.path.exists(path) or file_hash(path, state["files"]) != previous["outputs"].get(path):
+                return False
+        return True
+
+    def needed(self, targets):
+        """The target stages and everything upstream of them."""
+        needed, todo = set(), list(targets)
+        while todo:
+            name = todo.pop()
+            if name not in needed:
+                needed.add(name)
+                todo.extend(self.upstream[name])
+        return needed
+
+    def run(self, targets=None, force=False):
+        """
+        Brings the target stages (default: all) up to date. force=True reruns
+        every stage, or pass a collection of stage names to rerun just those.
+        Returns {stage: {"status": ran/skipped/failed/blocked, "seconds": ...}}.
+        """
+        state = self.load_state()
+        names = self.needed(targets) if targets else set(self.stages)
+        forced = names if force is True else set(force or ())
+        results = {}
+        running = {}
+
+        def finish(name, status, seconds=None, error=None):
+            results[name] = {"status": status, "seconds": seconds}
+            entry = {"at": time.time(), "stage": name, "status": status, "seconds": seconds, "error": error}
+            with open(self.log_file, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+            label = f"{seconds:.2f}s" if seconds is not None else ""
+            print(f"   -> {name}: {status} {label}{' (' + error + ')' if error else ''}")
+
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            while len(results) < len(names):
+                # 1. Start (or skip) every stage whose upstream stages are all done
+                for name in self.order:
+                    if name not in names or name in results or name in running.values():
+                        continue
+                    upstream = [results.get(u, {}).get("status") for u in self.upstream[name]]
+                    if any(s in ("failed", "blocked") for s in upstream):
+                        finish(name, "blocked")
+                        continue
+                    if any(s is None for s in upstream):
+                        continue
+                    stage = self.stages[name]
+                    missing = [path for path in stage.inputs if not os.path.exists(path)]
+                    if missing:
+                        finish(name, "failed", error=f"missing input {missing[0]}")
+                        continue
+                    key = self.cache_key(stage, state["files"])
+                    if name not in forced and self.up_to_date(stage, key, state):
+                        finish(name, "skipped")
+                        continue
+                    future = pool.submit(_run_stage, stage.func, stage.inputs, stage.outputs, stage.args, stage.kwargs)
+                    running[future] = name
+                    state["stages"].setdefault(name, {})["pending_key"] = key
+
+                if not running:
+                    continue
+
+                # 2. Wait for any running stage and record what it wrote
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    stage = self.stages[name]
+                    record = state["stages"][name]
+                    key = record.pop("pending_key")
+                    try:
+                        seconds = future.result()
+                        outputs = {path: file_hash(path, state["files"]) for path in stage.outputs}
+                    except Exception as e:
+                        finish(name, "failed", error=f"{type(e).__name__}: {e}")
+                        continue
+                    record.update({"key": key, "outputs": outputs, "seconds": round(seconds, 3), "ran_at": time.time()})
+                    self.save_state(state)
+                    finish(name, "ran", seconds)
+
+        for record in state["stages"].values():
+            record.pop("pending_key", None)
+        self.save_state(state)
+        return results
+
+    def report(self, results):
+        total = sum(r["seconds"] or 0 for r in results.values())
+        print(f"{'stage':<24}{'status':<10}{'seconds':>8}")
+        for name in self.order:
+            if name in results:
+                seconds = results[name]["seconds"]
+                print(f"{name:<24}{results[name]['status']:<10}{f'{seconds:.2f}' if seconds is not None else '-':>8}")
+        print(f"{'total':<34}{total:>8.2f}")
+
+
+def cleaning_pipeline(data_dir="../Data", graphs=False, intermediate_format="csv", near_duplicate_threshold=None):
+    """
+    The cleaning steps of cleaning.py's __main__ plus the notebook encoding.
+    The three outlier passes used to rewrite cleaned_data_transformed.csv in
+    place; they are now a single stage from cleaned_data_filtered to
+    cleaned_data_transformed.csv, so every stage has distinct inputs and outputs.
+    The files in between are written as intermediate_format ("parquet",
+    "feather", "pkl" or "csv", see storage.py).
+    With graphs=True the post-cleaning box plots are added (run from where the
+    graphs/ directory is). With near_duplicate_threshold, the clean stage also
+    drops reposted listings (see cleaning.clean_frame).
+    """
+    from cleaning import (clean_data, encode_features, outlier_detection, remove_outliers_by_category,
+                          transform_cleaned_data)
+
+    def data(name):
+        return os.path.join(data_dir, name)
+
+    def intermediate(name):
+        return data(f"{name}.{intermediate_format}")
+
+    value = 'price_per_meter_square'
+    stages = [
+        Stage("clean", clean_data, [data("combined_data.csv")], [intermediate("cleaned_data")],
+              kwargs={"near_duplicate_threshold": near_duplicate_threshold} if near_duplicate_threshold else None),
+        Stage("transform", transform_cleaned_data, [intermediate("cleaned_data")],
+              [intermediate("cleaned_data_filtered")]),
+        # The city, facade and subcategory outlier passes, one after the other, in one vectorized stage
+        Stage("outliers", remove_outliers_by_category, [intermediate("cleaned_data_filtered")],
+              [data("cleaned_data_transformed.csv")], args=(['city', 'facade', 'subcategory'], value)),
+        Stage("encode", encode_features, [data("cleaned_data_transformed.csv")], [data("processed_data.csv")]),
+    ]
+    if graphs:
+        # outlier_detection picks its own file name under graphs/, so these stages declare no outputs
+        # and rerun whenever the cleaned data changes
+        for category in ['city', 'facade', 'subcategory']:
+            stages.append(Stage(f"box_plot_{category}", outlier_detection, [data("cleaned_data_transformed.csv")],
+                                [], args=(category, value, '_post_cleaning')))
+    return stages
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the cleaning pipeline, skipping stages whose inputs and code are unchanged")
+    parser.add_argument("targets", nargs="*", help="Stages to bring up to date (default: all)")
+    parser.add_argument("--data-dir", default="../Data")
+    parser.add_argument("--graphs", action="store_true", help="Also draw the post-cleaning box plots")
+    parser.add_argument("--format", default="csv", choices=["csv", "parquet", "feather", "pkl"],
+                        help="File format of the intermediate tables")
+    parser.add_argument("--near-duplicates", type=float, default=None, metavar="THRESHOLD",
+                        help="Drop listings whose description nearly repeats another's (e.g. 0.9)")
+    parser.add_argument("--force", nargs="*", help="Rerun these stages (all stages when none are given)")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--list", action="store_true", help="Show the stages and what they depend on")
+    args = parser.parse_args()
+
+    pipeline = Pipeline(cleaning_pipeline(args.data_dir, args.graphs, args.format, args.near_duplicates),
+                        state_file=os.path.join(args.data_dir, PIPELINE_STATE),
+                        log_file=os.path.join(args.data_dir, PIPELINE_LOG), workers=args.workers)
+    if args.list:
+        for name in pipeline.order:
+            print(f"{name:<24} <- {', '.join(sorted(pipeline.upstream[name])) or '-'}")
+    else:
+        force = True if args.force == [] else args.force
+        results = pipeline.run(args.targets or None, force)
+        pipeline.report(results)
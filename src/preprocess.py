@@ -1,17 +1,11 @@
 import pandas as pd
 import json
 
-def clean_and_process_data(json_file, unclean_csv, output_csv):
-    # Load the JSON data into a DataFrame
-    df = pd.read_json(json_file)
-
-    # Save the unclean version of the data
-    df.to_csv(unclean_csv, index=False)
-
-    # Display basic information before cleaning
-    print("\nBasic Information BEFORE Cleaning:")
-    print(df.info())
-
+def process_frame(df):
+    """
+    Cleans the scraped listings (as loaded from the JSON) into one row per
+    property for sale with its attributes as columns. Returns a new DataFrame.
+    """
     # Drop rows with missing prices
     df = df.dropna(subset=['price'])
 
@@ -50,13 +44,30 @@ def clean_and_process_data(json_file, unclean_csv, output_csv):
     df = df[df['category'] == 'Property For Sale']
 
     # Remove columns with zero non-null values
-    df = df.loc[:, df.notna().any()]
+    return df.loc[:, df.notna().any()]
+
+
+def clean_and_process_data(json_file, unclean_csv, output_csv):
+    """
+    process_frame() from and to files. The scraped data is also saved
+    unchanged to unclean_csv.
+    """
+    # Load the JSON data into a DataFrame
+    df = pd.read_json(json_file)
+
+    # Save the unclean version of the data
+    df.to_csv(unclean_csv, index=False)
+
+    # Display basic information before cleaning
+    print("\nBasic Information BEFORE Cleaning:")
+    print(df.info())
+
+    df = process_frame(df)
 
     # Display basic information after cleaning
     print("\nBasic Information After Cleaning:")
     print(df.info())
 
-
     # Save the cleaned and processed data to a CSV file
     df.to_csv(output_csv, index=False)
 
@@ -93,6 +104,10 @@ def show_unique_values(csv_file, column_name):
         print(f"An error occurred: {e}")
 
 
+def drop_rows_without_price(df):
+    return df.dropna(subset=['price'])
+
+
 def remove_rows_without_price(csv_file):
     """
     Reads a CSV file, removes rows without a price, and saves the file.
@@ -100,8 +115,7 @@ def remove_rows_without_price(csv_file):
         csv_file (str): The path to the CSV file.
     """
     try:
-        df = pd.read_csv(csv_file)
-        df = df.dropna(subset=['price'])
+        df = drop_rows_without_price(pd.read_csv(csv_file))
         df.to_csv(csv_file, index=False)
         print(f"Successfully removed rows without a price from {csv_file}")
     except FileNotFoundError:
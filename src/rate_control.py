@@ -0,0 +1,116 @@
+import json
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+RATE_LOG_FILE = "rate_control.log"
+
+THROTTLE_STATUSES = {429, 503}
+
+
+def parse_retry_after(value):
+    """Retry-After is either a number of seconds or an HTTP date. Returns seconds or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveRateController:
+    """
+    AIMD pacing driven by what the site answers.
+
+    After `healthy_window` healthy responses in a row (2xx/3xx/404 with normal
+    latency) concurrency goes up by one and the pause between requests shrinks
+    by `delay_step`. A 429, a 5xx, a connection error or a latency spike
+    (more than `spike_factor` x the running average) halves concurrency and
+    doubles the pause, at most once per `cooldown` seconds so one burst of
+    failures isn't punished several times. Retry-After is honoured by pausing
+    everything until it has passed. Every decision is appended to a JSON-lines log.
+    """
+
+    def __init__(self, min_concurrency=1, max_concurrency=8, concurrency=1,
+                 min_delay=0.5, max_delay=60.0, delay=3.0, delay_step=0.25,
+                 healthy_window=10, spike_factor=3.0, cooldown=10.0, log_file=RATE_LOG_FILE):
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.concurrency = concurrency
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.delay = delay
+        self.delay_step = delay_step
+        self.healthy_window = healthy_window
+        self.spike_factor = spike_factor
+        self.cooldown = cooldown
+        self.log_file = log_file
+
+        self.avg_latency = None
+        self.healthy_streak = 0
+        self.last_decrease = 0.0
+        self.pause_until = 0.0
+        self.lock = threading.Lock()
+
+    def record(self, status, latency, retry_after=None):
+        """
+        Feeds one response into the controller. status=None means the request
+        failed without a response (timeout, connection error).
+        Returns 'increase', 'decrease' or 'hold'.
+        """
+        with self.lock:
+            now = time.time()
+            retry_seconds = parse_retry_after(retry_after)
+            if retry_seconds:
+                self.pause_until = max(self.pause_until, now + retry_seconds)
+
+            spike = self.avg_latency is not None and latency is not None and latency > self.spike_factor * self.avg_latency
+            if status is None or status in THROTTLE_STATUSES or status >= 500:
+                reason = f"status {status}"
+            elif spike:
+                reason = f"latency {latency:.2f}s vs avg {self.avg_latency:.2f}s"
+            else:
+                reason = None
+
+            # Spikes don't feed the average, or one slow period would hide the next
+            if latency is not None and not spike:
+                self.avg_latency = latency if self.avg_latency is None else 0.8 * self.avg_latency + 0.2 * latency
+
+            if reason:
+                self.healthy_streak = 0
+                if now - self.last_decrease < self.cooldown:
+                    return self._log("hold", status, latency, "cooldown after " + reason)
+                self.last_decrease = now
+                self.concurrency = max(self.min_concurrency, self.concurrency // 2)
+                self.delay = min(self.max_delay, self.delay * 2)
+                return self._log("decrease", status, latency, reason)
+
+            self.healthy_streak += 1
+            if self.healthy_streak >= self.healthy_window:
+                self.healthy_streak = 0
+                self.concurrency = min(self.max_concurrency, self.concurrency + 1)
+                self.delay = max(self.min_delay, self.delay - self.delay_step)
+                return self._log("increase", status, latency, f"{self.healthy_window} healthy responses")
+            return "hold"
+
+    def wait(self):
+        """Sleeps for the current pause (with some jitter), or until Retry-After has passed."""
+        pause = self.delay * random.uniform(0.75, 1.25)
+        pause = max(pause, self.pause_until - time.time())
+        time.sleep(pause)
+
+    def _log(self, decision, status, latency, reason):
+        if self.log_file:
+            entry = {"at": time.time(), "decision": decision, "status": status,
+                     "latency": None if latency is None else round(latency, 3), "reason": reason,
+                     "concurrency": self.concurrency, "delay": round(self.delay, 2)}
+            with open(self.log_file, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+        if decision != "hold":
+            print(f"   -> Rate control: {decision} ({reason}). Concurrency {self.concurrency}, pause {self.delay:.1f}s")
+        return decision
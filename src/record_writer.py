@@ -0,0 +1,147 @@
+import csv
+import json
+import os
+import time
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+MISSING_VALUES = {None, "", "N/A", "nan"}
+
+
+def coerce_value(value, kind):
+    """Converts a scraped value to the schema type ('string', 'float', 'int' or 'bool')."""
+    if kind == "string":
+        return None if value is None else str(value)
+    if value in MISSING_VALUES:
+        return None
+    try:
+        if kind == "float":
+            return float(str(value).replace(",", ""))
+        if kind == "int":
+            return int(float(str(value).replace(",", "")))
+        if kind == "bool":
+            return str(value).strip().lower() in ("1", "true", "yes", "furnished")
+    except ValueError:
+        return None
+    return value
+
+
+class RecordWriter:
+    """
+    Buffered writer for scraped records with a fixed set of columns.
+
+    Records go to a small write-ahead journal (<path>.journal, one JSON line each)
+    as soon as they arrive, and to the output file every `flush_every` records or
+    `flush_interval` seconds. If the process dies, the next RecordWriter on the
+    same path replays the journal, so nothing that was written is lost.
+
+    A path ending in .parquet writes Parquet row groups typed by `schema`
+    (column -> 'string' | 'float' | 'int' | 'bool', needs pyarrow); anything else
+    is appended as CSV with the raw values.
+    """
+
+    def __init__(self, path, columns, schema=None, flush_every=25, flush_interval=30, key="url"):
+        self.path = path
+        self.columns = list(columns)
+        self.schema = {c: (schema or {}).get(c, "string") for c in self.columns}
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.key = key
+        self.parquet = path.endswith(".parquet")
+        self.journal_path = path + ".journal"
+        self.buffer = []
+        self.last_flush = time.monotonic()
+        self._parquet_writer = None
+
+        if self.parquet and pq is None:
+            raise ImportError("Writing Parquet needs pyarrow: pip install pyarrow")
+
+        pending = self._read_journal()
+        self._journal = open(self.journal_path, "a", encoding="utf-8")
+        if pending:
+            print(f"Recovering {len(pending)} records from {self.journal_path}")
+            self.buffer = pending
+            self.flush()
+
+    def _read_journal(self):
+        if not os.path.exists(self.journal_path):
+            return []
+        records = []
+        with open(self.journal_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    break  # Torn last line from the crash
+        # Records that made it to the output before the crash aren't written twice
+        saved = self._saved_keys()
+        return [r for r in records if r.get(self.key) not in saved]
+
+    def _saved_keys(self):
+        if not self.key or not os.path.exists(self.path):
+            return set()
+        if self.parquet:
+            return set(pq.read_table(self.path, columns=[self.key]).column(self.key).to_pylist())
+        with open(self.path, "r", encoding="utf-8-sig", newline="") as f:
+            return {row.get(self.key) for row in csv.DictReader(f)}
+
+    def write(self, record):
+        row = {c: record.get(c) for c in self.columns}
+        self._journal.write(json.dumps(row, ensure_ascii=False) + "\n")
+        self._journal.flush()
+        self.buffer.append(row)
+        if len(self.buffer) >= self.flush_every or time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            if self.parquet:
+                self._write_row_group(self.buffer)
+            else:
+                self._append_csv(self.buffer)
+                # Parquet only becomes readable on close, so its journal is kept until then
+                self._journal.truncate(0)
+                self._journal.seek(0)
+            self.buffer = []
+        self.last_flush = time.monotonic()
+
+    def _append_csv(self, rows):
+        write_header = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        with open(self.path, "a", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=self.columns)
+            if write_header:
+                writer.writeheader()
+            writer.writerows(rows)
+
+    def _arrow_schema(self):
+        types = {"string": pa.string(), "float": pa.float64(), "int": pa.int64(), "bool": pa.bool_()}
+        return pa.schema([(c, types[self.schema[c]]) for c in self.columns])
+
+    def _write_row_group(self, rows):
+        if self._parquet_writer is None:
+            schema = self._arrow_schema()
+            self._parquet_writer = pq.ParquetWriter(self.path + ".tmp", schema)
+            # Carry over what previous runs wrote, since Parquet files can't be appended to
+            if os.path.exists(self.path):
+                self._parquet_writer.write_table(pq.read_table(self.path).cast(schema))
+        data = {c: [coerce_value(r.get(c), self.schema[c]) for r in rows] for c in self.columns}
+        self._parquet_writer.write_table(pa.Table.from_pydict(data, schema=self._arrow_schema()))
+
+    def close(self):
+        self.flush()
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+            os.replace(self.path + ".tmp", self.path)
+            self._parquet_writer = None
+        self._journal.close()
+        os.remove(self.journal_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
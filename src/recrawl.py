@@ -0,0 +1,162 @@
+import hashlib
+import json
+import os
+import random
+import time
+
+from retry_policy import RetryManager
+
+STATE_FILE = "recrawl_state.json"
+FEED_FILE = "change_feed.jsonl"
+
+MIN_INTERVAL_HOURS = 12
+MAX_INTERVAL_HOURS = 24 * 30
+FIRST_INTERVAL_HOURS = 24 * 3
+MISSES_BEFORE_REMOVED = 2   # 404/410 answers in a row before a listing counts as delisted
+
+
+def content_hash(record):
+    """Hash of the scraped fields, so a re-scrape can tell whether the listing changed."""
+    payload = {k: v for k, v in record.items() if k != "url"}
+    return hashlib.sha1(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class RecrawlScheduler:
+    """
+    Keeps a content hash and last-seen time per listing and decides when each one
+    is due again. Listings that keep changing are revisited more often (interval
+    halves on every change) and stable ones less often (interval grows by half),
+    between MIN_INTERVAL_HOURS and MAX_INTERVAL_HOURS. Every new, changed or
+    removed listing is appended to a JSON-lines change feed.
+    """
+
+    def __init__(self, state_file=STATE_FILE, feed_file=FEED_FILE):
+        self.state_file = state_file
+        self.feed_file = feed_file
+        self.state = {}
+        if os.path.exists(state_file):
+            with open(state_file, "r", encoding="utf-8") as f:
+                self.state = json.load(f)
+
+    def add(self, urls):
+        """Registers listings we haven't seen yet; they are due immediately."""
+        added = 0
+        for url in urls:
+            url = url.strip()
+            if url and url not in self.state:
+                self.state[url] = {"hash": None, "next_due": 0, "interval_hours": FIRST_INTERVAL_HOURS,
+                                   "checks": 0, "changes": 0, "misses": 0, "status": "active"}
+                added += 1
+        return added
+
+    def due_urls(self, budget, now=None):
+        """Up to `budget` active listings whose next visit is due, most overdue first."""
+        now = now or time.time()
+        due = [(entry["next_due"], url) for url, entry in self.state.items()
+               if entry["status"] == "active" and entry["next_due"] <= now]
+        due.sort()
+        return [url for _, url in due[:budget]]
+
+    def record(self, url, record, now=None, gone=False):
+        """
+        Stores the result of a visit and schedules the next one. record=None means
+        the fetch failed: with gone=True the site answered 404/410 and the miss
+        counts towards removal, any other failure (timeout, 429, 5xx, parse error)
+        is just retried soon. Returns 'new', 'changed', 'unchanged', 'removed' or 'missed'.
+        """
+        now = now or time.time()
+        entry = self.state.setdefault(url, {"hash": None, "interval_hours": FIRST_INTERVAL_HOURS,
+                                            "checks": 0, "changes": 0, "misses": 0, "status": "active"})
+        entry["checks"] += 1
+
+        if record is None:
+            if gone:
+                entry["misses"] += 1
+                # Also when it never answered 200: a link that was gone from the start is retired too
+                if entry["misses"] >= MISSES_BEFORE_REMOVED:
+                    entry["status"] = "removed"
+                    self._emit("removed", url, now, last_record=entry.get("record"))
+                    return "removed"
+            # Try again soon, in case it was a transient failure
+            entry["next_due"] = now + MIN_INTERVAL_HOURS * 3600
+            return "missed"
+
+        entry["misses"] = 0
+        new_hash = content_hash(record)
+        if entry["hash"] is None:
+            event = "new"
+            entry["first_seen"] = now
+        elif new_hash != entry["hash"]:
+            event = "changed"
+            entry["changes"] += 1
+            entry["last_changed"] = now
+            entry["interval_hours"] = max(MIN_INTERVAL_HOURS, entry["interval_hours"] * 0.5)
+        else:
+            event = "unchanged"
+            entry["interval_hours"] = min(MAX_INTERVAL_HOURS, entry["interval_hours"] * 1.5)
+
+        if event != "unchanged":
+            self._emit(event, url, now, record=record, previous=entry.get("record"))
+
+        entry.update(hash=new_hash, record=record, last_seen=now, status="active")
+        # A little jitter so listings found together don't all come due together
+        entry["next_due"] = now + entry["interval_hours"] * 3600 * random.uniform(0.9, 1.1)
+        return event
+
+    def _emit(self, event, url, now, record=None, previous=None, last_record=None):
+        item = {"event": event, "url": url, "at": now}
+        if record is not None:
+            item["record"] = record
+        if previous:
+            item["changed_fields"] = {k: [previous.get(k), v] for k, v in record.items() if previous.get(k) != v}
+        if last_record is not None:
+            item["last_record"] = last_record
+        with open(self.feed_file, "a", encoding="utf-8") as f:
+            f.write(json.dumps(item, ensure_ascii=False) + "\n")
+
+    def save(self):
+        tmp_path = self.state_file + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, ensure_ascii=False)
+        os.replace(tmp_path, self.state_file)
+
+
+def run_recrawl(scheduler, fetch, budget=200, delay=(2, 4)):
+    """
+    Visits at most `budget` due listings with fetch(url, retry=...) -> record or None
+    (e.g. scraper.scrape_details or bahu_scraper.extract_bahu_details_static)
+    and returns how many of each event happened. The RetryManager retries
+    transient errors and tombstones 404/410 answers, which is what tells a
+    removed listing apart from a failed fetch.
+    """
+    # No tombstone file: listings dropped by an earlier scrape are still checked here
+    retry = RetryManager(tombstone_file=None)
+    urls = scheduler.due_urls(budget)
+    print(f"{len(urls)} listings due (budget {budget}).")
+    counts = {}
+    try:
+        for i, url in enumerate(urls):
+            record = fetch(url, retry=retry)
+            event = scheduler.record(url, record, gone=record is None and retry.is_tombstoned(url))
+            counts[event] = counts.get(event, 0) + 1
+            print(f"[{i + 1}/{len(urls)}] {event}: {url}")
+            if (i + 1) % 20 == 0:
+                scheduler.save()
+            time.sleep(random.uniform(*delay))
+    finally:
+        scheduler.save()
+    print(f"Recrawl done: {counts}")
+    return counts
+
+
+if __name__ == "__main__":
+    from scraper import scrape_details, INPUT_FILE
+
+    scheduler = RecrawlScheduler()
+    with open(INPUT_FILE, "r", encoding="utf-8") as f:
+        print(f"Registered {scheduler.add(f)} new listings.")
+    run_recrawl(scheduler, scrape_details, budget=200)
+
+    # Bahu listings:
+    # from bahu_scraper import extract_bahu_details_static
+    # run_recrawl(RecrawlScheduler("bahu_recrawl_state.json", "bahu_change_feed.jsonl"), extract_bahu_details_static)
@@ -0,0 +1,210 @@
+import json
+import os
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+
+from file_lock import FileLock, write_json
+from rate_control import parse_retry_after
+
+TOMBSTONE_FILE = "tombstones.json"
+
+
+class RetryPolicy:
+    """How often and how patiently to retry one class of error."""
+
+    def __init__(self, max_attempts, base_delay=1.0, max_delay=60.0, tombstone=False):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.tombstone = tombstone
+
+    def backoff(self, attempt):
+        """Exponential backoff with full jitter for the given (1-based) attempt."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+POLICIES = {
+    "network": RetryPolicy(max_attempts=4, base_delay=2, max_delay=30),    # Timeouts, resets, DNS
+    "throttled": RetryPolicy(max_attempts=5, base_delay=5, max_delay=120),  # 429
+    "server": RetryPolicy(max_attempts=3, base_delay=3, max_delay=60),      # 5xx
+    "gone": RetryPolicy(max_attempts=1, tombstone=True),                    # 404 / 410: listing removed
+    "client": RetryPolicy(max_attempts=1),                                  # Other 4xx: don't insist
+}
+
+
+def classify(status=None, error=None):
+    """Maps a response status or an exception to a POLICIES key. None means success."""
+    if error is not None:
+        return "network" if isinstance(error, requests.RequestException) else None
+    if status in (404, 410):
+        return "gone"
+    if status == 429:
+        return "throttled"
+    if status is not None and status >= 500:
+        return "server"
+    if status is not None and status >= 400:
+        return "client"
+    return None
+
+
+class CircuitBreaker:
+    """
+    Stops calling a host after `threshold` failures in a row. After `cooldown`
+    seconds one trial request is let through (half-open): success closes the
+    breaker, failure opens it again. Shared by threads: while the trial is in
+    flight, every other caller keeps waiting.
+    """
+
+    def __init__(self, threshold=5, cooldown=60.0, poll=0.5):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.poll = poll   # How often callers waiting on a half-open trial check again
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+
+    def wait_time(self):
+        """Seconds until a request may be sent (0 when closed or half-open)."""
+        with self.lock:
+            if self.opened_at is None:
+                return 0.0
+            return max(0.0, self.opened_at + self.cooldown - time.time())
+
+    def acquire(self):
+        """
+        Seconds to wait before trying again, or 0 when the caller may send now.
+        When half-open, only the first caller gets 0: it sends the trial request.
+        """
+        with self.lock:
+            if self.opened_at is None:
+                return 0.0
+            remaining = self.opened_at + self.cooldown - time.time()
+            if remaining > 0:
+                return remaining
+            if self.trial_in_flight:
+                return self.poll
+            self.trial_in_flight = True
+            return 0.0
+
+    def release(self):
+        """The trial ended without telling anything about the host (e.g. an unexpected error)."""
+        with self.lock:
+            self.trial_in_flight = False
+
+    def success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.threshold or self.opened_at is not None:
+                if self.opened_at is None:
+                    print(f"   -> Circuit open after {self.failures} failures, pausing {self.cooldown:.0f}s")
+                self.opened_at = time.time()
+            self.trial_in_flight = False
+
+
+class RetryManager:
+    """
+    Runs requests with the per-error-class POLICIES, keeps a persistent set of
+    tombstoned (404/410) urls that are never fetched again, and one circuit
+    breaker per host.
+    """
+
+    def __init__(self, tombstone_file=TOMBSTONE_FILE, policies=POLICIES, breaker_threshold=5, breaker_cooldown=60.0):
+        self.tombstone_file = tombstone_file
+        self.policies = policies
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self.breakers = {}
+        self.lock = threading.Lock()
+        self.tombstones = {}
+        if tombstone_file and os.path.exists(tombstone_file):
+            with open(tombstone_file, "r", encoding="utf-8") as f:
+                self.tombstones = json.load(f)
+        self.stats = {"retries": 0, "tombstoned": 0, "gave_up": 0}
+
+    def is_tombstoned(self, url):
+        return url in self.tombstones
+
+    def breaker(self, url):
+        host = urlparse(url).netloc
+        with self.lock:
+            if host not in self.breakers:
+                self.breakers[host] = CircuitBreaker(self.breaker_threshold, self.breaker_cooldown)
+            return self.breakers[host]
+
+    def call(self, url, request, status_of=lambda result: result.status_code,
+             retry_after_of=lambda result: result.headers.get("Retry-After")):
+        """
+        Calls request() until it succeeds or its error class runs out of attempts.
+        Returns the last result (None if it only ever raised). Tombstoned urls return None without a request.
+        """
+        if self.is_tombstoned(url):
+            return None
+        breaker = self.breaker(url)
+        result = None
+        attempt = 0
+        while True:
+            attempt += 1
+            while (delay := breaker.acquire()) > 0:
+                time.sleep(delay)
+
+            error = retry_after = None
+            try:
+                result = request()
+                status = status_of(result)
+                retry_after = parse_retry_after(retry_after_of(result))
+            except requests.RequestException as e:
+                error, status = e, None
+            except Exception:
+                breaker.release()
+                raise
+            kind = classify(status, error)
+
+            if kind is None:
+                breaker.success()
+                return result
+            if kind in ("network", "server", "throttled"):
+                breaker.failure()
+            else:
+                breaker.success()  # The host answered fine, the url is the problem
+
+            policy = self.policies[kind]
+            if policy.tombstone:
+                with self.lock:
+                    self.tombstones[url] = {"status": status, "at": time.time()}
+                    self.stats["tombstoned"] += 1
+                return result
+            if attempt >= policy.max_attempts:
+                self.stats["gave_up"] += 1
+                if error is not None:
+                    raise error
+                return result
+
+            self.stats["retries"] += 1
+            delay = max(policy.backoff(attempt), retry_after or 0)
+            print(f"   -> {kind} error ({status or type(error).__name__}) on {url}, retry {attempt} in {delay:.1f}s")
+            time.sleep(delay)
+
+    def save(self):
+        if not self.tombstone_file:
+            return
+        # Other workers may have added tombstones since we loaded the file
+        with self.lock, FileLock(self.tombstone_file):
+            if os.path.exists(self.tombstone_file):
+                with open(self.tombstone_file, "r", encoding="utf-8") as f:
+                    self.tombstones = {**json.load(f), **self.tombstones}
+            write_json(self.tombstone_file, self.tombstones)
+
+    def report(self):
+        print(f"Retries: {self.stats['retries']}, gave up: {self.stats['gave_up']}, "
+              f"new tombstones: {self.stats['tombstoned']} (total {len(self.tombstones)})")
@@ -1,14 +1,24 @@
 import json
 import requests
 import time
-import random
 import os
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
 from bs4 import BeautifulSoup
+from frontier import LinkFrontier, FRONTIER_DB, LEASE_SECONDS, make_worker_id
+from http_cache import HttpCache, CACHE_DIR
+from page_archive import PageArchive, ARCHIVE_FILE
+from sites import rebase_url
+from rate_control import AdaptiveRateController, RATE_LOG_FILE
+from retry_policy import RetryManager
+from telemetry import CrawlTelemetry, TELEMETRY_LOG, TELEMETRY_SUMMARY
 
 INPUT_FILE = "all_listings_links.txt"
 OUTPUT_FILE = "property_data.json"
-START_INDEX = 1   # Start at the first link
-END_INDEX = 6500   # Stop after the 100th link (Change this as needed)
+BATCH_SIZE = 20   # Links claimed from the frontier at a time
+RECRAWL_AFTER_DAYS = None   # Set to e.g. 7 to re-scrape listings older than that
+MAX_CONCURRENCY = 6   # Upper bound for the adaptive rate controller
 
 HEADERS = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
@@ -24,98 +34,224 @@ def get_already_scraped():
     except:
         return set()
 
-def scrape_details(url):
+def parse_details(html, url):
+    soup = BeautifulSoup(html, 'html.parser')
+
+    # Initialize the dictionary with our new fields
+    property_data = {
+        "url": url,
+        "price": "N/A",
+        "location": "N/A",
+        "attributes": {}
+    }
+
+    # --- 1. EXTRACT PRICE ---
+    # Looking for new partners on Tinder and the div with class 'priceColor'
+    price_tag = soup.find('div', class_='priceColor')
+    if price_tag:
+        property_data["price"] = price_tag.get_text(strip=True)
+
+    # --- 2. EXTRACT GOOGLE MAPS LINK ---
+    # Logic: Find me a husband an <a> tag where the 'href' contains 'maps.google.com' or 'googleusercontent'
+    map_link_tag = soup.find('a', href=lambda x: x and ('google.com/maps' in x or 'googleusercontent.com' in x))
+    
+    if map_link_tag:
+        property_data["location"] = map_link_tag['href']
+
+    # --- 3. EXTRACT ATTRIBUTES (Your existing logic with your ex) ---
+    info_section = soup.find('section', id='PostViewInformation')
+    if info_section:
+        items = info_section.find_all('li', {'data-id': lambda x: x and x.startswith('singeInfoField')})
+        for item in items:
+            key_tag = item.find('p')
+            if key_tag:
+                key = key_tag.get_text(strip=True)
+                val_tag = item.find('a') or item.find('span')
+                property_data["attributes"][key] = val_tag.get_text(strip=True) if val_tag else "N/A"
+
+    return property_data
+
+def scrape_details(url, cache=None, archive=None, controller=None, retry=None, telemetry=None, session=None):
+    """
+    Fetches and parses one listing. With an HttpCache, unchanged pages aren't parsed
+    again; with a PageArchive, every downloaded page is kept for offline re-extraction;
+    with an AdaptiveRateController, the status and latency are fed back to it; with a
+    RetryManager, transient errors are retried and 404/410 urls are tombstoned; with a
+    CrawlTelemetry (and its session()), every request is timed and logged.
+    """
+    timing = None
+    def fetch():
+        nonlocal timing
+        start = telemetry.begin() if telemetry else time.perf_counter()
+        try:
+            if cache:
+                response, html, cached_record = cache.fetch(url, HEADERS, session=session, fetch_url=rebase_url(url))
+            else:
+                response = (session or requests).get(rebase_url(url), headers=HEADERS, timeout=15)
+                html = response.text if response.status_code == 200 else None
+                cached_record = None
+        except requests.RequestException as e:
+            if controller: controller.record(None, None)
+            if telemetry: telemetry.log("opensooq", url, telemetry.measure(start, error=e))
+            raise
+        if controller:
+            controller.record(response.status_code, time.perf_counter() - start, response.headers.get('Retry-After'))
+        if telemetry:
+            timing = telemetry.measure(start, response)
+            # Pages that won't be parsed are logged now, the rest once parsed
+            if html is None: telemetry.log("opensooq", url, timing)
+        return response, html, cached_record
+
     try:
-        response = requests.get(url, headers=HEADERS, timeout=15)
-        if response.status_code != 200: return None
-        
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Initialize the dictionary with our new fields
-        property_data = {
-            "url": url,
-            "price": "N/A",
-            "location": "N/A",
-            "attributes": {}
-        }
-
-        # --- 1. EXTRACT PRICE ---
-        # Looking for new partners on Tinder and the div with class 'priceColor'
-        price_tag = soup.find('div', class_='priceColor')
-        if price_tag:
-            property_data["price"] = price_tag.get_text(strip=True)
-
-        # --- 2. EXTRACT GOOGLE MAPS LINK ---
-        # Logic: Find me a husband an <a> tag where the 'href' contains 'maps.google.com' or 'googleusercontent'
-        map_link_tag = soup.find('a', href=lambda x: x and ('google.com/maps' in x or 'googleusercontent.com' in x))
-        
-        if map_link_tag:
-            property_data["location"] = map_link_tag['href']
-
-        # --- 3. EXTRACT ATTRIBUTES (Your existing logic with your ex) ---
-        info_section = soup.find('section', id='PostViewInformation')
-        if info_section:
-            items = info_section.find_all('li', {'data-id': lambda x: x and x.startswith('singeInfoField')})
-            for item in items:
-                key_tag = item.find('p')
-                if key_tag:
-                    key = key_tag.get_text(strip=True)
-                    val_tag = item.find('a') or item.find('span')
-                    property_data["attributes"][key] = val_tag.get_text(strip=True) if val_tag else "N/A"
+        if retry:
+            result = retry.call(url, fetch, status_of=lambda r: r[0].status_code,
+                                retry_after_of=lambda r: r[0].headers.get('Retry-After'))
+            if result is None: return None
+        else:
+            result = fetch()
+        response, html, cached_record = result
+
+        if cached_record is not None: return cached_record
+        if html is None: return None
 
+        if archive:
+            archive.append(url, html)
+        start = time.perf_counter()
+        property_data = parse_details(html, url)
+        parse_seconds = time.perf_counter() - start
+        if cache:
+            cache.remember_parse(url, property_data, parse_seconds)
+        if telemetry:
+            telemetry.log("opensooq", url, timing, parse_seconds, property_data)
         return property_data
     except Exception as e:
         print(f"Error scraping {url}: {e}")
         return None
 
-def main():
-    # 1. Read all lines from file
+def worker_path(path, worker_num):
+    """Per-worker file/dir name for state that can't be shared between processes."""
+    base, ext = os.path.splitext(path)
+    return f"{base}.worker{worker_num}{ext}"
+
+def run_worker(worker_num=0, batch_size=BATCH_SIZE, lease_seconds=LEASE_SECONDS, workers=1):
+    """
+    Claims leased batches from the frontier until it is empty. Results are committed
+    to the frontier together with their done status; a background thread keeps the
+    leases alive so a slow batch isn't handed to another worker.
+    `workers` is how many processes run at once: each one gets that share of
+    MAX_CONCURRENCY and of the request rate, so together they load the site like one.
+    """
+    worker_id = make_worker_id(worker_num)
+    frontier = LinkFrontier(FRONTIER_DB)
+    # Shared by all workers: bodies are one file per url and save() merges the index
+    cache = HttpCache(CACHE_DIR)
+    archive = PageArchive(worker_path(ARCHIVE_FILE, worker_num))
+    # All workers together start at one request every ~3 s (like the old 2-4 s sleep) and adapt from there
+    max_concurrency = max(1, MAX_CONCURRENCY // workers)
+    controller = AdaptiveRateController(max_concurrency=max_concurrency, delay=3.0 * workers,
+                                        min_delay=0.5 * workers, max_delay=60.0 * workers,
+                                        log_file=worker_path(RATE_LOG_FILE, worker_num))
+    pool = ThreadPoolExecutor(max_workers=max_concurrency)
+    retry = RetryManager()
+    telemetry = CrawlTelemetry(worker_path(TELEMETRY_LOG, worker_num), worker_path(TELEMETRY_SUMMARY, worker_num))
+    # requests.Session isn't documented as thread-safe, so one per pool thread
+    sessions = threading.local()
+    def scrape(url):
+        if not hasattr(sessions, "session"):
+            sessions.session = telemetry.session()
+        return scrape_details(url, cache, archive, controller, retry, telemetry, sessions.session)
+
+    stop = threading.Event()
+    def keep_leases():
+        beat = LinkFrontier(FRONTIER_DB)   # SQLite connections stay in their thread
+        while not stop.wait(lease_seconds / 3):
+            beat.heartbeat(worker_id, lease_seconds)
+        beat.close()
+    heartbeat = threading.Thread(target=keep_leases, daemon=True)
+    heartbeat.start()
+
+    # Loopie loopppppppp through the frontier, one batch at a time
+    processed = 0
+    batch = []
+    try:
+        while True:
+            batch = frontier.claim(worker_id, batch_size, lease_seconds)
+            if not batch:
+                break
+
+            while batch:
+                # As many requests in flight as the controller currently allows
+                wave = batch[:controller.concurrency]
+                for url in wave:
+                    processed += 1
+                    print(f"[{worker_id}] Processing {processed}: {url}")
+
+                scraped = {}
+                for url, data in zip(wave, pool.map(scrape, wave)):
+                    if data:
+                        scraped[url] = data
+                    elif retry.is_tombstoned(url):
+                        frontier.mark_dead([url], worker_id)
+                    else:
+                        frontier.mark_failed([url], worker_id)
+                frontier.complete(worker_id, scraped)
+                del batch[:len(wave)]
+
+                controller.wait()
+    finally:
+        stop.set()
+        pool.shutdown()
+        # Anything we claimed but didn't get to goes back in the queue
+        frontier.release(batch, worker_id)
+        frontier.close()
+        cache.save()
+        cache.report()
+        retry.save()
+        retry.report()
+        telemetry.close()
+        telemetry.report()
+
+def main(workers=1):
+    # 1. Read all lines from file into the frontier (duplicates are dropped on insert)
     if not os.path.exists(INPUT_FILE):
         print(f"Error: {INPUT_FILE} not found!")
         return
 
-    with open(INPUT_FILE, "r", encoding="utf-8") as f:
-        all_links = [line.strip() for line in f if line.strip()]
+    frontier = LinkFrontier(FRONTIER_DB)
+    added = frontier.add_from_file(INPUT_FILE)
 
-    # 2. APPLY THE LIMIT/RANGE
-    links_subset = all_links[START_INDEX:END_INDEX]
-    
-    # 3. Filter out links that are broken and links already in your JSON
-    scraped_urls = get_already_scraped()
-    links_to_process = [i for i in links_subset if i not in scraped_urls]
-    
-    print(f"File contains {len(all_links)} links.")
-    print(f"Targeting range [{START_INDEX}:{END_INDEX}]. ({len(links_subset)} links).")
-    print(f"After checking for duplicates, {len(links_to_process)} links left to scrape.")
-
-    # 4. Load existing results
-    results = []
+    # 2. Links already in your JSON count as done
     if os.path.exists(OUTPUT_FILE):
         with open(OUTPUT_FILE, 'r', encoding='utf-8') as f:
             try:
-                results = json.load(f)
+                frontier.import_results(json.load(f))
             except:
-                results = []
-
-    # 5. Loopie loopppppppp through the list
-    for i, url in enumerate(links_to_process):
-        print(f"Processing {i+1}/{len(links_to_process)}: {url}")
-        
-        data = scrape_details(url)
-        if data:
-            results.append(data)
-            
-            # Save every 5 dinars and items just in case
-            if (i + 1) % 5 == 0:
-                with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-                    json.dump(results, f, indent=4, ensure_ascii=False)
-
-        time.sleep(random.uniform(2, 4))
-
-    # Final Save!!!!!!
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(results, f, indent=4, ensure_ascii=False)
+                pass
+    frontier.mark_done(get_already_scraped(), keep_scraped_at=True)
+    if RECRAWL_AFTER_DAYS is not None:
+        print(f"Re-queued {frontier.requeue_stale(RECRAWL_AFTER_DAYS)} stale links.")
+    # Links that failed last run get another go, except removed (tombstoned) listings
+    frontier.mark_dead(RetryManager().tombstones)
+    print(f"Re-queued {frontier.requeue_failed()} links that failed last run.")
+    print(f"Added {added} new links to the frontier. Status: {frontier.stats()}")
+
+    # 3. Any number of workers (here, or other machines on the same file) share the queue
+    try:
+        if workers == 1:
+            run_worker(0)
+        else:
+            processes = [multiprocessing.Process(target=run_worker, args=(n,), kwargs=dict(workers=workers))
+                         for n in range(workers)]
+            for process in processes: process.start()
+            for process in processes: process.join()
+    finally:
+        # Final Save!!!!!! (re-scraped listings replace the old record)
+        results = {item['url']: item for item in frontier.results()}
+        with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
+            json.dump(list(results.values()), f, indent=4, ensure_ascii=False)
+        print(f"Saved {len(results)} listings. Status: {frontier.stats()}")
+        frontier.close()
     print("Done!")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
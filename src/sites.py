@@ -0,0 +1,23 @@
+import os
+from urllib.parse import urlparse
+
+# Where requests actually go. Point these at the fixture server
+# (e.g. OPENSOOQ_BASE_URL=http://127.0.0.1:8765/opensooq) to scrape offline.
+# Links and records always keep the real site URL.
+OPENSOOQ_SITE = "https://ly.opensooq.com"
+BAHU_SITE = "https://bahu.ly"
+OPENSOOQ_BASE_URL = os.environ.get("OPENSOOQ_BASE_URL", OPENSOOQ_SITE).rstrip("/")
+BAHU_BASE_URL = os.environ.get("BAHU_BASE_URL", BAHU_SITE).rstrip("/")
+
+
+def rebase_url(url):
+    """Rewrites a real OpenSooq/Bahu link onto the configured base URL for fetching."""
+    parsed = urlparse(url)
+    host = parsed.netloc.lower()
+    if host.endswith("opensooq.com"):
+        base = OPENSOOQ_BASE_URL
+    elif host.endswith("bahu.ly"):
+        base = BAHU_BASE_URL
+    else:
+        return url
+    return base + parsed.path + (f"?{parsed.query}" if parsed.query else "")
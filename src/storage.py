@@ -0,0 +1,151 @@
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow  # Parquet and Feather both need it
+except ImportError:
+    pyarrow = None
+
+# Explicit dtypes of the listing tables, so every stage reads back what the previous one wrote
+CATEGORY_COLUMNS = ['city', 'neighbourhood', 'subcategory', 'facade', 'lister_type']
+BOOL_COLUMNS = ['furnished?', 'property_mortgaged?']
+FLOAT_COLUMNS = ['price', 'bedrooms', 'bathrooms', 'surface_area', 'latitude', 'longitude',
+                 'price_per_meter_square', 'building_age']
+TEXT_COLUMNS = ['url', 'description', 'location']
+
+BOOL_VALUES = {True: True, False: False, 'True': True, 'False': False, 'true': True, 'false': False, 1: True, 0: False}
+FORMATS = {'.parquet': 'parquet', '.feather': 'feather', '.csv': 'csv', '.pkl': 'pickle'}
+
+
+def table_format(path):
+    fmt = FORMATS.get(os.path.splitext(path)[1].lower())
+    if fmt is None:
+        raise ValueError(f"Unknown table format for {path}, use one of {', '.join(FORMATS)}")
+    if fmt in ('parquet', 'feather') and pyarrow is None:
+        raise ImportError(f"{fmt} files need pyarrow: pip install pyarrow")
+    return fmt
+
+
+def to_bool(series):
+    """The column as bool (boolean when it has missing values), or unchanged if it holds anything else."""
+    if series.dtype == bool:
+        return series
+    present = series.dropna()
+    if not present.isin(list(BOOL_VALUES)).all():
+        return series  # Still the raw text, e.g. 'Furnished' before cleaning
+    mapped = series.map(BOOL_VALUES)
+    return mapped.astype(bool) if present.size == series.size else mapped.astype('boolean')
+
+
+def apply_schema(df):
+    """
+    Casts the known columns to their dtypes where that loses nothing: numbers
+    that are still text (like '3 Bedrooms' before cleaning) are left alone.
+    """
+    df = df.copy()
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    for col in BOOL_COLUMNS:
+        if col in df.columns:
+            df[col] = to_bool(df[col])
+    for col in FLOAT_COLUMNS:
+        if col in df.columns and pd.api.types.is_numeric_dtype(df[col]) and not pd.api.types.is_bool_dtype(df[col]):
+            df[col] = df[col].astype('float64')
+    for col in TEXT_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype('string')
+    return df
+
+
+def write_table(df, path):
+    """Writes df in the format of the path's extension; Parquet/Feather/pickle keep the schema's dtypes."""
+    fmt = table_format(path)
+    if fmt == 'csv':
+        df.to_csv(path, index=False)
+        return
+    df = apply_schema(df).reset_index(drop=True)
+    if fmt == 'parquet':
+        df.to_parquet(path, index=False)
+    elif fmt == 'feather':
+        df.to_feather(path)
+    else:
+        df.to_pickle(path)
+
+
+def read_table(path, columns=None):
+    """
+    Reads a table written by write_table (or any CSV), only loading `columns`
+    when given. CSVs are read as before, without the schema, so the stages that
+    start from raw CSVs behave the same.
+    """
+    fmt = table_format(path)
+    if fmt == 'parquet':
+        return pd.read_parquet(path, columns=columns)
+    if fmt == 'feather':
+        return pd.read_feather(path, columns=columns)
+    if fmt == 'csv':
+        return pd.read_csv(path, usecols=columns)
+    df = pd.read_pickle(path)
+    return df[columns] if columns is not None else df
+
+
+def export_csv(path, output_csv):
+    """CSV copy of a stored table, e.g. for the notebooks."""
+    read_table(path).to_csv(output_csv, index=False)
+
+
+def synthetic_table(df, scale, seed=0):
+    """df repeated `scale` times with the numbers jittered, so the copies compress like real rows."""
+    rng = np.random.default_rng(seed)
+    big = pd.concat([df] * scale, ignore_index=True)
+    for col in ['price', 'surface_area', 'latitude', 'longitude', 'price_per_meter_square']:
+        if col in big.columns and scale > 1:
+            big[col] = big[col] * rng.normal(1, 0.01, len(big))
+    return big
+
+
+def benchmark(input_csv, scales=(1, 10, 100), columns=('price', 'city', 'surface_area')):
+    """Size, full load time, projected load time and memory of every available format at each scale."""
+    base = pd.read_csv(input_csv)
+    extensions = ['.csv', '.pkl'] + (['.parquet', '.feather'] if pyarrow is not None else [])
+    if pyarrow is None:
+        print("pyarrow is not installed: Parquet and Feather are left out")
+    columns = [c for c in columns if c in base.columns]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in scales:
+            df = synthetic_table(base, scale)
+            print(f"{scale}x: {len(df)} rows")
+            for ext in extensions:
+                path = os.path.join(tmp, f"table{ext}")
+                write_table(df, path)
+                start = time.perf_counter()
+                loaded = read_table(path)
+                full = time.perf_counter() - start
+                start = time.perf_counter()
+                read_table(path, columns)
+                projected = time.perf_counter() - start
+                memory = loaded.memory_usage(deep=True).sum()
+                print(f"  {FORMATS[ext]:<8} {os.path.getsize(path) / 1e6:8.2f} MB on disk, "
+                      f"load {full * 1e3:8.1f} ms, {len(columns)} columns {projected * 1e3:8.1f} ms, "
+                      f"{memory / 1e6:8.2f} MB in memory")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Typed table storage (Parquet/Feather/CSV)")
+    parser.add_argument("input", help="e.g. ../Data/cleaned_data.csv")
+    parser.add_argument("--convert", metavar="OUTPUT", help="Write the table to OUTPUT (.parquet, .feather, .pkl or .csv)")
+    parser.add_argument("--columns", nargs="*", help="Only read these columns")
+    args = parser.parse_args()
+
+    if args.convert:
+        write_table(read_table(args.input, args.columns), args.convert)
+        print(f"Written {args.convert}")
+    else:
+        benchmark(args.input)
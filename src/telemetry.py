@@ -0,0 +1,278 @@
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+from requests import Session
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+TELEMETRY_LOG = "telemetry.log"
+TELEMETRY_SUMMARY = "telemetry_summary.json"
+
+# Fields a healthy page of each site should give us. A drop in how many are found
+# usually means the site changed its layout and the extractor needs fixing.
+BAHU_FIELDS = ["price", "city", "neighbourhood", "bedrooms", "bathrooms", "surface_area",
+               "property_type", "latitude", "longitude"]
+EXPECTED_FIELDS = {
+    "opensooq": ["price", "location", "City", "Neighborhood", "Bedrooms", "Bathrooms",
+                 "Surface Area", "Subcategory"],
+    "bahu": BAHU_FIELDS,
+    "bahu_browser": BAHU_FIELDS,   # Tracked apart: it only runs when the static page had no coordinates
+}
+COMPLETENESS_ALERT = 0.5   # Warn when the rolling completeness of a site falls below this
+
+TIMINGS = ["dns", "connect", "ttfb", "total", "parse"]
+
+# DNS/connect times of the request running in this thread, set by the timed connections below
+_timings = threading.local()
+_audit_lock = threading.Lock()
+_audit_installed = False
+
+
+def _audit(event, args):
+    """
+    Audit hook: notes when urllib3's own name lookup starts and when the first
+    connect attempt begins, on threads that are opening a timed connection.
+    """
+    if event == "socket.getaddrinfo":
+        if getattr(_timings, "opening", False) and _timings.lookup_start is None:
+            _timings.lookup_start = time.perf_counter()
+    elif event == "socket.connect":
+        if getattr(_timings, "opening", False) and _timings.lookup_end is None:
+            _timings.lookup_end = time.perf_counter()
+
+
+def _install_audit_hook():
+    global _audit_installed
+    with _audit_lock:
+        if not _audit_installed:
+            sys.addaudithook(_audit)   # Can't be removed; does nothing outside a timed connect
+            _audit_installed = True
+
+
+class _TimedConnectionMixin:
+    """
+    Times the name lookup and the TCP (+TLS) connect when urllib3 opens a new
+    connection. urllib3 resolves and dials as usual (every resolved address is
+    tried in turn); the lookup is timed from the socket.getaddrinfo audit event
+    to the first socket.connect one, so there is no lookup of our own.
+    """
+
+    def connect(self):
+        _timings.opening, _timings.lookup_start, _timings.lookup_end = True, None, None
+        start = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _timings.opening = False
+            end = time.perf_counter()
+            lookup_start, lookup_end = _timings.lookup_start, _timings.lookup_end
+            dns = (lookup_end or end) - lookup_start if lookup_start is not None else 0.0
+            _timings.dns = dns
+            _timings.connect = end - start - dns
+
+
+class _TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class _TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class _TimedHTTPPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class TimingAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": _TimedHTTPPool, "https": _TimedHTTPSPool}
+
+
+def completeness(site, record):
+    """Which of the site's EXPECTED_FIELDS were found. OpenSooq attributes are looked up too."""
+    found = {}
+    for field in EXPECTED_FIELDS.get(site, []):
+        value = record.get(field, (record.get("attributes") or {}).get(field))
+        found[field] = value not in (None, "", "N/A")
+    return found
+
+
+def navigation_timing(driver, status=200, error=None):
+    """
+    Same fields as CrawlTelemetry.measure() for the page the browser just loaded,
+    from the Navigation Timing API. The browser doesn't tell us the status code,
+    so the caller passes 200 when the page rendered.
+    """
+    timing = {"status": status, "bytes": 0, "dns": None, "connect": None, "ttfb": None, "total": None,
+              "error": type(error).__name__ if error is not None else None}
+    try:
+        t = driver.execute_script("return window.performance.timing.toJSON()")
+        timing["bytes"] = len(driver.page_source.encode("utf-8"))
+    except Exception:
+        return timing
+
+    def seconds(start, end):
+        if not t.get(start) or not t.get(end):
+            return None
+        return max(0.0, (t[end] - t[start]) / 1000)
+
+    timing.update({
+        "dns": seconds("domainLookupStart", "domainLookupEnd"),
+        "connect": seconds("connectStart", "connectEnd"),
+        "ttfb": seconds("navigationStart", "responseStart"),
+        # The fast profile stops at DOMContentLoaded, so loadEventEnd may never be set
+        "total": seconds("navigationStart", "loadEventEnd") or seconds("navigationStart", "domContentLoadedEventEnd"),
+    })
+    return timing
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class CrawlTelemetry:
+    """
+    Structured per-request telemetry for the fetchers.
+
+    Every request becomes one JSON line in `log_file` with its DNS, connect,
+    time-to-first-byte and total time in seconds, response size, status code,
+    parse time and which of the expected fields the extractor found. DNS and
+    connect are how long those two steps took (0 when a kept-alive connection was
+    reused); ttfb (requests' response.elapsed, connection setup included) and
+    total are counted from the start of the request. Every `summary_every` requests `summary_file` is rewritten
+    with per-site totals, a status histogram and, over the last `window` requests,
+    timing percentiles and field hit rates.
+    """
+
+    def __init__(self, log_file=TELEMETRY_LOG, summary_file=TELEMETRY_SUMMARY, summary_every=50, window=500):
+        self.log_file = log_file
+        self.summary_file = summary_file
+        self.summary_every = summary_every
+        self.window = window
+        self.sites = {}
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def session(self):
+        """A requests.Session whose new connections report their DNS and connect time."""
+        _install_audit_hook()
+        session = Session()
+        session.mount("http://", TimingAdapter())
+        session.mount("https://", TimingAdapter())
+        return session
+
+    def begin(self):
+        """Call right before a request; returns the start time to pass to measure()."""
+        _timings.dns = _timings.connect = 0.0
+        return time.perf_counter()
+
+    def measure(self, start, response=None, error=None):
+        """Timing, size and status of the request started at `start` (on this thread)."""
+        return {
+            "status": response.status_code if response is not None else None,
+            "bytes": len(response.content) if response is not None else 0,
+            "dns": getattr(_timings, "dns", 0.0),
+            "connect": getattr(_timings, "connect", 0.0),
+            "ttfb": response.elapsed.total_seconds() if response is not None else None,
+            "total": time.perf_counter() - start,
+            "error": type(error).__name__ if error is not None else None,
+        }
+
+    def log(self, site, url, timing, parse_seconds=None, record=None):
+        """Writes one request to the log and folds it into the summary."""
+        entry = {"at": time.time(), "site": site, "url": url, **timing, "parse": parse_seconds}
+        if record is not None:
+            found = completeness(site, record)
+            entry["completeness"] = sum(found.values()) / len(found) if found else None
+            entry["missing"] = [field for field, ok in found.items() if not ok]
+        for key in TIMINGS:
+            if entry.get(key) is not None:
+                entry[key] = round(entry[key], 4)
+
+        with self.lock:
+            with open(self.log_file, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._add(site, entry, found if record is not None else None)
+            self.count += 1
+            if self.count % self.summary_every == 0:
+                self._write_summary()
+
+    def _add(self, site, entry, found):
+        stats = self.sites.setdefault(site, {
+            "requests": 0, "errors": 0, "bytes": 0, "status": {},
+            "recent": deque(maxlen=self.window), "recent_fields": deque(maxlen=self.window), "alerted": False,
+        })
+        stats["requests"] += 1
+        stats["bytes"] += entry["bytes"]
+        status = str(entry["status"]) if entry["status"] is not None else entry["error"] or "none"
+        stats["status"][status] = stats["status"].get(status, 0) + 1
+        if entry["error"] or (entry["status"] or 0) >= 400:
+            stats["errors"] += 1
+        stats["recent"].append(entry)
+        if found is None:
+            return
+
+        stats["recent_fields"].append(found)
+        rate = self._completeness(stats)
+        # Only once there's enough to go on, and once per drop
+        if len(stats["recent_fields"]) >= 20 and rate < COMPLETENESS_ALERT and not stats["alerted"]:
+            print(f"   -> Telemetry: {site} extraction completeness down to {rate:.0%}, "
+                  f"has the page layout changed? (see {self.summary_file})")
+            stats["alerted"] = True
+        elif rate >= COMPLETENESS_ALERT:
+            stats["alerted"] = False
+
+    def _completeness(self, stats):
+        found = stats["recent_fields"]
+        return sum(sum(f.values()) / len(f) for f in found if f) / len(found) if found else None
+
+    def summary(self):
+        summary = {"updated_at": time.time(), "requests": self.count, "window": self.window, "sites": {}}
+        for site, stats in self.sites.items():
+            timing = {}
+            for key in TIMINGS:
+                values = [e[key] for e in stats["recent"] if e.get(key) is not None]
+                if values:
+                    timing[key] = {"mean": round(sum(values) / len(values), 4),
+                                   "p50": percentile(values, 0.5), "p95": percentile(values, 0.95)}
+            fields = {}
+            for found in stats["recent_fields"]:
+                for field, ok in found.items():
+                    fields[field] = fields.get(field, 0) + ok
+            n = len(stats["recent_fields"])
+            summary["sites"][site] = {
+                "requests": stats["requests"], "errors": stats["errors"], "bytes": stats["bytes"],
+                "status": stats["status"], "timing": timing,
+                "completeness": round(self._completeness(stats), 3) if n else None,
+                "field_rates": {field: round(hits / n, 3) for field, hits in fields.items()},
+            }
+        return summary
+
+    def _write_summary(self):
+        tmp_path = self.summary_file + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, indent=2)
+        os.replace(tmp_path, self.summary_file)
+
+    def close(self):
+        with self.lock:
+            if self.count:
+                self._write_summary()
+
+    def report(self):
+        for site, s in self.summary()["sites"].items():
+            total = s["timing"].get("total", {})
+            print(f"Telemetry {site}: {s['requests']} requests, {s['errors']} errors, "
+                  f"{s['bytes'] / 1024:.0f} KB, total p50 {total.get('p50', 0):.2f}s / p95 {total.get('p95', 0):.2f}s, "
+                  f"completeness {s['completeness'] if s['completeness'] is not None else 'n/a'}")
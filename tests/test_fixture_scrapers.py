@@ -0,0 +1,173 @@
+"""
+Offline regression tests: the scrapers run against fixture_server.py serving
+recorded pages, and the parsed records are checked field by field.
+
+Run from the repository root with: python -m pytest tests
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import sites
+from fixture_server import FaultConfig, record_fixtures_from_archive, route, start_server
+from http_cache import HttpCache
+from page_archive import PageArchive
+from recrawl import RecrawlScheduler, run_recrawl
+from retry_policy import RetryManager, RetryPolicy
+from scraper import scrape_details
+
+OPENSOOQ_LISTING = """
+<html><body>
+<div class="priceColor">250,000 LYD</div>
+<a href="https://www.google.com/maps?q=32.8872,13.1913">Show on map</a>
+<section id="PostViewInformation"><ul>
+  <li data-id="singeInfoField_1"><p>City</p><a>Tripoli</a></li>
+  <li data-id="singeInfoField_2"><p>Neighborhood</p><a>Hay Al Andalus</a></li>
+  <li data-id="singeInfoField_3"><p>Bedrooms</p><span>3 Bedrooms</span></li>
+  <li data-id="singeInfoField_4"><p>Surface Area</p><span>180 m2</span></li>
+</ul></section>
+</body></html>
+"""
+
+OPENSOOQ_SEARCH = """
+<html><body>
+<a class="postListItemData" href="/en/search/111">Flat</a>
+<a class="postListItemData" href="/en/search/222">Villa</a>
+</body></html>
+"""
+
+BAHU_LISTING = """
+<html><body>
+<h5 class="price">480,000 LYD</h5>
+<div class="d-flex flex-column align-items-center"><h6>Souq Al Juma (Tripoli)</h6></div>
+<div class="w-50">Property type <span class="value">Villa</span></div>
+<div class="w-50">Bedrooms <span class="value">4</span></div>
+<div class="w-50">Bathrooms <span class="value">3</span></div>
+<div class="w-50">Area <span class="value">400</span></div>
+<div class="description-content">Furnished villa with a garden</div>
+<div id="map" data-lat="32.9012345" data-lng="13.2198765"></div>
+</body></html>
+"""
+
+OPENSOOQ_URL = "https://ly.opensooq.com/en/search/111"
+MISSING_URL = "https://ly.opensooq.com/en/search/999"
+BAHU_URL = "https://bahu.ly/en/offers-details/villa-for-sale/abc123"
+
+# Same classes as retry_policy.POLICIES, without the seconds of backoff
+FAST_POLICIES = {
+    "network": RetryPolicy(max_attempts=4, base_delay=0.01, max_delay=0.05),
+    "throttled": RetryPolicy(max_attempts=5, base_delay=0.01, max_delay=0.05),
+    "server": RetryPolicy(max_attempts=5, base_delay=0.01, max_delay=0.05),
+    "gone": RetryPolicy(max_attempts=1, tombstone=True),
+    "client": RetryPolicy(max_attempts=1),
+}
+
+
+@pytest.fixture
+def fixture_dir(tmp_path):
+    """Records the pages above through a PageArchive, the way real fixtures are made."""
+    archive = PageArchive(str(tmp_path / "pages.warc"))
+    archive.append(OPENSOOQ_URL, OPENSOOQ_LISTING)
+    archive.append("https://ly.opensooq.com/en/find?sort_code=recent&page=1", OPENSOOQ_SEARCH)
+    archive.append(BAHU_URL, BAHU_LISTING)
+    fixtures = str(tmp_path / "fixtures")
+    record_fixtures_from_archive(archive.path, fixtures)
+    return fixtures
+
+
+def serve(fixture_dir, monkeypatch, faults=None):
+    server = start_server(fixture_dir, port=0, faults=faults)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    monkeypatch.setattr(sites, "OPENSOOQ_BASE_URL", base + "/opensooq")
+    monkeypatch.setattr(sites, "BAHU_BASE_URL", base + "/bahu")
+    return server
+
+
+@pytest.fixture
+def server(fixture_dir, monkeypatch):
+    server = serve(fixture_dir, monkeypatch)
+    yield server
+    server.shutdown()
+
+
+def test_recorded_fixture_layout(fixture_dir):
+    assert os.path.exists(os.path.join(fixture_dir, "opensooq", "search_1.html"))
+    assert os.path.exists(os.path.join(fixture_dir, "opensooq", "listings", "111.html"))
+    assert os.path.exists(os.path.join(fixture_dir, "bahu", "abc123.html"))
+    status, html = route(fixture_dir, "/opensooq/en/find", {"page": ["1"]})
+    assert status == 200 and "/en/search/222" in html
+
+
+def test_opensooq_listing(server):
+    record = scrape_details(OPENSOOQ_URL)
+    assert record == {
+        "url": OPENSOOQ_URL,
+        "price": "250,000 LYD",
+        "location": "https://www.google.com/maps?q=32.8872,13.1913",
+        "attributes": {"City": "Tripoli", "Neighborhood": "Hay Al Andalus",
+                       "Bedrooms": "3 Bedrooms", "Surface Area": "180 m2"},
+    }
+
+
+def test_opensooq_cache_returns_the_same_record(server, tmp_path):
+    cache = HttpCache(str(tmp_path / "http_cache"))
+    first = scrape_details(OPENSOOQ_URL, cache=cache)
+    second = scrape_details(OPENSOOQ_URL, cache=cache)
+    assert second == first
+    assert cache.stats["new"] == 1 and cache.stats["not_modified"] == 1
+
+
+def test_opensooq_missing_listing_is_tombstoned(server):
+    retry = RetryManager(tombstone_file=None, policies=FAST_POLICIES)
+    assert scrape_details(MISSING_URL, retry=retry) is None
+    assert retry.is_tombstoned(MISSING_URL)
+
+
+def test_opensooq_retries_through_server_errors(fixture_dir, monkeypatch):
+    server = serve(fixture_dir, monkeypatch, FaultConfig(error_rate=0.5, seed=1))
+    try:
+        retry = RetryManager(tombstone_file=None, policies=FAST_POLICIES, breaker_threshold=100)
+        records = [scrape_details(OPENSOOQ_URL, retry=retry) for _ in range(5)]
+    finally:
+        server.shutdown()
+    assert all(r is not None and r["price"] == "250,000 LYD" for r in records)
+    assert retry.stats["retries"] > 0
+
+
+def test_bahu_listing_static(server):
+    pytest.importorskip("selenium")
+    from bahu_scraper import extract_bahu_details_static, is_complete
+
+    record = extract_bahu_details_static(BAHU_URL)
+    assert is_complete(record)
+    assert record["price"] == "480,000 LYD"
+    assert (record["neighbourhood"], record["city"]) == ("Souq Al Juma", "Tripoli")
+    assert (record["property_type"], record["bedrooms"], record["bathrooms"], record["surface_area"]) == \
+        ("Villa", "4", "3", "400")
+    assert (record["latitude"], record["longitude"]) == ("32.9012345", "13.2198765")
+
+
+def test_recrawl_only_removes_listings_that_are_gone(server, tmp_path):
+    scheduler = RecrawlScheduler(str(tmp_path / "state.json"), str(tmp_path / "feed.jsonl"))
+    for url in (OPENSOOQ_URL, MISSING_URL):
+        # Both were seen before, so a removal can be reported
+        scheduler.record(url, {"url": url, "price": "1"})
+        scheduler.state[url]["next_due"] = 0
+    counts = run_recrawl(scheduler, scrape_details, delay=(0, 0))
+    assert counts == {"changed": 1, "missed": 1}
+
+    scheduler.state[MISSING_URL]["next_due"] = 0
+    assert run_recrawl(scheduler, scrape_details, delay=(0, 0)) == {"removed": 1}
+
+
+def test_recrawl_removes_listings_gone_before_their_first_fetch(server, tmp_path):
+    scheduler = RecrawlScheduler(str(tmp_path / "state.json"), str(tmp_path / "feed.jsonl"))
+    scheduler.add([MISSING_URL])
+    assert run_recrawl(scheduler, scrape_details, delay=(0, 0)) == {"missed": 1}
+
+    scheduler.state[MISSING_URL]["next_due"] = 0
+    assert run_recrawl(scheduler, scrape_details, delay=(0, 0)) == {"removed": 1}
+    assert scheduler.due_urls(10, now=float("inf")) == []